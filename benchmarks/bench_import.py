@@ -0,0 +1,81 @@
+"""
+Benchmark: import time
+
+Measures the time taken by import gilfoyle.report in fresh interpreters, checks it against a budget, and checks
+that the heavy dependencies are left for the code paths that use them.
+
+Usage:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --budget 100 --repeat 20
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Milliseconds allowed for import gilfoyle.report, measured as the median of several fresh interpreters
+BUDGET_MS = 100
+
+# Modules that importing gilfoyle.report must not load
+HEAVY_MODULES = ['numpy', 'pandas', 'weasyprint', 'jinja2', 'PIL', 'asyncio', 'multiprocessing']
+
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'ms': seconds * 1000, 'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+
+def measure(module='gilfoyle.report', repeat=10):
+    """Import a module in fresh interpreters and return the import times and heavy modules loaded.
+
+    Args:
+        module (optional, string): Module to import.
+        repeat (optional, int): Number of interpreters to start.
+
+    Returns:
+        dict: Median, minimum and maximum milliseconds, and the heavy modules loaded by the import.
+    """
+
+    times = []
+    loaded = set()
+    script = SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+
+    for i in range(repeat):
+        result = json.loads(subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                           check=True).stdout)
+        times.append(result['ms'])
+        loaded.update(result['loaded'])
+
+    return {'module': module,
+            'median_ms': statistics.median(times),
+            'min_ms': min(times),
+            'max_ms': max(times),
+            'loaded': sorted(loaded)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the import time of gilfoyle.report against a budget.')
+    parser.add_argument('--budget', type=float, default=BUDGET_MS, help='Budget in milliseconds.')
+    parser.add_argument('--repeat', type=int, default=10, help='Number of fresh interpreters to time.')
+    args = parser.parse_args()
+
+    result = measure(repeat=args.repeat)
+    print('import {module}: median {median_ms:.1f} ms (min {min_ms:.1f}, max {max_ms:.1f}), '
+          'budget {budget:.0f} ms'.format(budget=args.budget, **result))
+
+    failures = []
+    if result['median_ms'] > args.budget:
+        failures.append('over budget by {:.1f} ms'.format(result['median_ms'] - args.budget))
+    if result['loaded']:
+        failures.append('imported ' + ', '.join(result['loaded']))
+
+    if failures:
+        print('FAIL: ' + '; '.join(failures))
+        sys.exit(1)
+
+    print('OK')
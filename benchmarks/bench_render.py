@@ -0,0 +1,235 @@
+"""
+Benchmark: report rendering
+
+Renders synthetic reports to HTML and PDF and records throughput, time per phase and peak memory use.
+Each case runs in a fresh process so its peak RSS is its own. Results are saved as JSON so runs can be
+compared across Gilfoyle, WeasyPrint and Pandas versions.
+
+Usage:
+    python -m benchmarks.bench_render
+    python -m benchmarks.bench_render --cases small-html small-pdf --repeat 5 --output results.json
+    python -m benchmarks.bench_render --compare before.json after.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from datetime import timezone
+
+CASES = {
+    'small-html': {'output': 'html', 'pages': 10, 'shape': (13, 6), 'images': 2},
+    'small-pdf': {'output': 'pdf', 'pages': 10, 'shape': (13, 6), 'images': 2},
+    'large-html': {'output': 'html', 'pages': 200, 'shape': (13, 10), 'images': 8},
+    'large-pdf': {'output': 'pdf', 'pages': 200, 'shape': (13, 10), 'images': 8},
+    'wide-tables-pdf': {'output': 'pdf', 'pages': 50, 'shape': (1000, 200), 'images': 0,
+                        'layouts': ['simple']},
+    'images-pdf': {'output': 'pdf', 'pages': 50, 'shape': (13, 6), 'images': 25,
+                   'layouts': ['plot', 'left-commentary']},
+}
+
+# Options passed to Report for every case, so the benchmark never touches the network
+REPORT_OPTIONS = {'allow_network': False}
+
+
+def get_peak_rss():
+    """Return the peak resident set size of the current process in bytes."""
+
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def get_versions():
+    """Return the versions of Python and the packages that affect rendering speed."""
+
+    versions = {'python': platform.python_version(), 'platform': platform.platform()}
+
+    for name in ('gilfoyle', 'weasyprint', 'pandas', 'numpy', 'jinja2'):
+        try:
+            from importlib.metadata import version
+            versions[name] = version(name)
+        except Exception:
+            versions[name] = None
+
+    # Uninstalled checkouts are identified by their commit
+    try:
+        versions['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        versions['commit'] = None
+
+    return versions
+
+
+def run_case(name, case, repeat, options):
+    """Build and render one benchmark case, returning its timings. Runs inside a child process.
+
+    Building the payload includes formatting the dataframes, so throughput covers both.
+
+    Args:
+        name: Case name.
+        case: Case settings, see CASES.
+        repeat: Number of times to render the report.
+        options: Extra keyword arguments for Report.
+
+    Returns:
+        dict: Case results.
+    """
+
+    from gilfoyle import report
+    from gilfoyle.profiling import Profiler
+    from benchmarks.payloads import make_payload
+
+    output = case['output']
+    directory = tempfile.mkdtemp(prefix='gilfoyle-bench-')
+    target = os.path.join(directory, name + '.' + output)
+    runs = []
+
+    for i in range(repeat):
+        profiler = Profiler()
+        pdf = report.Report(output=target, profiler=profiler, **dict(REPORT_OPTIONS, **options))
+        pdf.set_title('Benchmark')
+
+        start = time.perf_counter()
+        payload = make_payload(pdf,
+                               pages=case['pages'],
+                               layouts=case.get('layouts'),
+                               shape=case['shape'],
+                               images=case['images'])
+        built = time.perf_counter()
+        pdf.create_report(payload, output=output)
+        rendered = time.perf_counter()
+
+        runs.append({'seconds': rendered - start,
+                     'build_seconds': built - start,
+                     'render_seconds': rendered - built,
+                     'pages': len(payload['pages']),
+                     'bytes': os.path.getsize(target),
+                     'phases': {phase: stats['seconds'] for phase, stats in profiler.stats()['phases'].items()}})
+
+    os.remove(target)
+    os.rmdir(directory)
+
+    best = min(runs, key=lambda run: run['seconds'])
+    return {'case': name,
+            'settings': dict(case, shape=list(case['shape'])),
+            'options': options,
+            'repeat': repeat,
+            'pages': best['pages'],
+            'bytes': best['bytes'],
+            'seconds': best['seconds'],
+            'build_seconds': best['build_seconds'],
+            'render_seconds': best['render_seconds'],
+            'pages_per_second': best['pages'] / best['seconds'],
+            'phases': best['phases'],
+            'peak_rss': get_peak_rss(),
+            'runs': runs}
+
+
+def _run_case(queue, name, case, repeat, options):
+    try:
+        queue.put(run_case(name, case, repeat, options))
+    except Exception as error:
+        queue.put({'case': name, 'error': repr(error)})
+
+
+def run(cases=None, repeat=3, options=None):
+    """Run benchmark cases, each in a fresh process.
+
+    Args:
+        cases (optional, list): Case names. Defaults to every case in CASES.
+        repeat (optional, int): Number of builds and renders per case. The fastest is reported.
+        options (optional, dict): Extra keyword arguments for Report, i.e. {'cache_stylesheets': True}
+
+    Returns:
+        dict: Versions, options and case results.
+    """
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+
+    for name in cases or list(CASES):
+        queue = context.Queue()
+        process = context.Process(target=_run_case, args=(queue, name, CASES[name], repeat, options or {}))
+        process.start()
+        result = queue.get()
+        process.join()
+        results.append(result)
+        print_result(result)
+
+    return {'created': datetime.now(timezone.utc).isoformat(),
+            'versions': get_versions(),
+            'options': options or {},
+            'results': results}
+
+
+def print_result(result):
+    if 'error' in result:
+        print('{:<18} failed: {}'.format(result['case'], result['error']))
+        return
+
+    print('{:<18} {:>6} pages {:>9.3f}s {:>8.1f} pages/s {:>9.1f} MB peak RSS'.format(
+        result['case'], result['pages'], result['seconds'], result['pages_per_second'],
+        result['peak_rss'] / 1024 ** 2))
+    print('{:<18} '.format('') + '  '.join(phase + ' ' + '{:.3f}s'.format(seconds)
+                                            for phase, seconds in result['phases'].items()))
+
+
+def compare(before, after):
+    """Print the change in render time and peak RSS between two saved benchmark runs.
+
+    Args:
+        before: Path of the earlier results JSON.
+        after: Path of the later results JSON.
+    """
+
+    with open(before) as f:
+        before = {result['case']: result for result in json.load(f)['results'] if 'error' not in result}
+    with open(after) as f:
+        after = {result['case']: result for result in json.load(f)['results'] if 'error' not in result}
+
+    print('{:<18} {:>12} {:>12} {:>9} {:>10}'.format('case', 'before s', 'after s', 'change', 'RSS change'))
+    for name in before:
+        if name in after:
+            old, new = before[name], after[name]
+            print('{:<18} {:>12.3f} {:>12.3f} {:>8.1f}% {:>9.1f}%'.format(
+                name, old['seconds'], new['seconds'],
+                (new['seconds'] / old['seconds'] - 1) * 100,
+                (new['peak_rss'] / old['peak_rss'] - 1) * 100))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark Gilfoyle report rendering.')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), help='Cases to run. Defaults to all.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case. The fastest is reported.')
+    parser.add_argument('--option', action='append', default=[], metavar='NAME=VALUE',
+                        help='Report option to benchmark, i.e. --option cache_stylesheets=true')
+    parser.add_argument('--output', help='Results JSON path. Defaults to bench-<timestamp>.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Compare two results files.')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit()
+
+    options = {}
+    for option in args.option:
+        key, value = option.split('=', 1)
+        options[key] = json.loads(value) if value in ('true', 'false', 'null') or value[:1].isdigit() else value
+
+    results = run(args.cases, args.repeat, options)
+    path = args.output or 'bench-' + datetime.now().strftime('%Y%m%d-%H%M%S') + '.json'
+
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+
+    print('Saved ' + path)
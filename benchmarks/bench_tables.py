@@ -0,0 +1,64 @@
+"""
+Benchmark: table rendering
+
+Compares DataFrame.to_html with Gilfoyle's vectorized table renderer across dataframe shapes.
+
+Usage:
+    python -m benchmarks.bench_tables
+"""
+
+import timeit
+import numpy as np
+import pandas as pd
+from gilfoyle.tables import render_table
+from gilfoyle.tables import TABLE_CLASSES
+
+SHAPES = [(13, 6), (13, 50), (1000, 10), (100000, 10), (1000, 500), (100000, 200)]
+
+
+def make_dataframe(rows, cols, seed=0):
+    """Return a dataframe mixing integer, float, text and date columns.
+
+    Args:
+        rows: Number of rows.
+        cols: Number of columns.
+        seed (optional, int): Random seed.
+
+    Returns:
+        Pandas dataframe.
+    """
+
+    rng = np.random.default_rng(seed)
+    data = {}
+
+    for i in range(cols):
+        kind = i % 4
+        if kind == 0:
+            data['Sessions ' + str(i)] = rng.integers(0, 100000, rows)
+        elif kind == 1:
+            data['Revenue ' + str(i)] = rng.random(rows) * 10000
+        elif kind == 2:
+            data['Channel ' + str(i)] = rng.choice(['Organic', 'Paid <CPC>', 'Email & Social'], rows)
+        else:
+            data['Period ' + str(i)] = pd.date_range('2020-01-01', periods=rows, freq='D')
+
+    return pd.DataFrame(data)
+
+
+def to_html(dataframe):
+    return dataframe.to_html(classes=TABLE_CLASSES, max_rows=13, max_cols=10, index=False)
+
+
+if __name__ == '__main__':
+    print('{:>14} {:>12} {:>12} {:>8} {:>10} {:>10}'.format('shape', 'to_html ms', 'fast ms', 'speedup',
+                                                           'html bytes', 'fast bytes'))
+
+    for rows, cols in SHAPES:
+        df = make_dataframe(rows, cols)
+        number = 20
+        pandas_ms = min(timeit.repeat(lambda: to_html(df), number=number, repeat=3)) / number * 1000
+        fast_ms = min(timeit.repeat(lambda: render_table(df), number=number, repeat=3)) / number * 1000
+
+        print('{:>14} {:>12.3f} {:>12.3f} {:>7.1f}x {:>10} {:>10}'.format(
+            str(rows) + 'x' + str(cols), pandas_ms, fast_ms, pandas_ms / fast_ms,
+            len(to_html(df)), len(render_table(df))))
@@ -0,0 +1,116 @@
+"""
+Synthetic payloads
+
+Builds report payloads of any size for benchmarking, using only get_payload, add_page and add_metric_tile
+and images generated in memory, so benchmarks run offline.
+"""
+
+import struct
+import zlib
+import numpy as np
+from benchmarks.bench_tables import make_dataframe
+
+LAYOUTS = ['simple', 'left-commentary', 'plot']
+
+COMMENTARY = ('Sessions grew strongly on the previous period, led by organic search, while paid channels held '
+              'steady and the conversion rate improved across every device category.')
+
+
+def make_image(width=1600, height=600, seed=0):
+    """Return the bytes of an RGB PNG bar chart with random bar heights and colours.
+
+    Args:
+        width (optional, int): Width in pixels.
+        height (optional, int): Height in pixels.
+        seed (optional, int): Random seed, so each seed gives a different image.
+
+    Returns:
+        bytes: PNG image data.
+    """
+
+    rng = np.random.default_rng(seed)
+    bars = 24
+    bar_heights = rng.integers(height // 10, height, bars)
+    colours = rng.integers(0, 200, (bars, 3), dtype=np.uint8)
+
+    pixels = np.full((height, width, 3), 255, dtype=np.uint8)
+    for bar in range(bars):
+        left = bar * width // bars
+        pixels[height - bar_heights[bar]:, left + 4:(bar + 1) * width // bars - 4] = colours[bar]
+
+    # A filter byte of zero precedes every scanline
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, -1)], axis=1).tobytes()
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+def make_metrics(pdf, dataframe):
+    """Return a row of metric tiles for the first numeric columns of a dataframe.
+
+    Args:
+        pdf: Report.
+        dataframe: Pandas dataframe.
+
+    Returns:
+        list: Metric tile dictionaries.
+    """
+
+    columns = dataframe.select_dtypes('number').columns[:4]
+    return [pdf.add_metric_tile(metric_title=column,
+                                metric_value_now=dataframe[column].iloc[0],
+                                metric_value_before=dataframe[column].iloc[-1])
+            for column in columns]
+
+
+def make_payload(pdf, pages=50, layouts=None, shape=(13, 6), images=4, chapter_every=10, seed=0):
+    """Build a payload with a cover, chapter pages and report pages cycling through page layouts.
+
+    Args:
+        pdf: Report used to build the payload.
+        pages (optional, int): Number of report pages.
+        layouts (optional, list): Report page layouts to cycle through. Defaults to LAYOUTS.
+        shape (optional, tuple): Rows and columns of each page's dataframe.
+        images (optional, int): Number of distinct images shared by the pages that show one.
+        chapter_every (optional, int): Add a chapter page before every this many report pages.
+        seed (optional, int): Random seed.
+
+    Returns:
+        dict: Payload.
+    """
+
+    layouts = layouts or LAYOUTS
+    payload = pdf.get_payload()
+    charts = [make_image(seed=seed + i) for i in range(images)]
+
+    payload = pdf.add_page(payload,
+                           page_type='cover',
+                           page_title='Benchmark report',
+                           page_background=make_image(1920, 1080, seed) if images else None)
+
+    for i in range(pages):
+        if chapter_every and i % chapter_every == 0:
+            payload = pdf.add_page(payload,
+                                   page_type='chapter',
+                                   page_title='Chapter ' + str(i // chapter_every + 1),
+                                   page_subheading='Synthetic benchmark pages')
+
+        layout = layouts[i % len(layouts)]
+        dataframe = make_dataframe(shape[0], shape[1], seed + i)
+        visualisation = charts[i % len(charts)] if charts and layout != 'simple' else None
+
+        payload = pdf.add_page(payload,
+                               page_type='report',
+                               page_layout=layout,
+                               page_title='Page ' + str(i + 1),
+                               page_commentary=COMMENTARY if layout == 'left-commentary' else None,
+                               page_metrics=make_metrics(pdf, dataframe) if layout == 'simple' else None,
+                               page_dataframe=dataframe if layout != 'plot' else None,
+                               page_visualisation=visualisation)
+
+    return payload
@@ -3,9 +3,9 @@ Example 1
 """
 
 # Load packages
-import pandas as pd
 import seaborn as sns
 from gilfoyle import report
+from gilfoyle.sources import DataSource
 
 # ====================================================================================================================
 # Set up the report
@@ -21,6 +21,13 @@ pdf.set_accent_font_color('#fff')
 # Create an empty payload
 payload = pdf.get_payload()
 
+# Define the data sources. Only the first 13 rows are read, and each source is read once however many pages use it
+url = 'https://raw.githubusercontent.com/flyandlure/datasets/master/monthly-ecommerce-data.csv'
+source = DataSource(url, limit=13, read_options={
+    'skiprows': 1, 'names': ['Period', 'Sessions', 'Transactions', 'Conversion Rate', 'Revenue', 'AOV']})
+metrics_source = DataSource(url, limit=13, read_options={
+    'skiprows': 1, 'names': ['Period', 'Sessions', 'Transactions', 'Conversion rate', 'Revenue', 'AOV']})
+
 # ====================================================================================================================
 # Chapter cover
 # ====================================================================================================================
@@ -34,27 +41,20 @@ payload = pdf.add_page(payload,
 # Simple layout with dataframe
 # ====================================================================================================================
 
-# Load a Pandas dataframe and return 13 rows
-df = pd.read_csv('https://raw.githubusercontent.com/flyandlure/datasets/master/monthly-ecommerce-data.csv',
-                 skiprows=1,
-                 names=['Period', 'Sessions', 'Transactions', 'Conversion Rate', 'Revenue', 'AOV']).head(13)
-
-# Add the dataframe to the payload
+# Add the data source to the payload, it is read when the page is added
 payload = pdf.add_page(payload,
                        page_type='report',
                        page_layout='simple',
                        page_title='Simple layout, dataframe',
-                       page_dataframe=df
+                       page_dataframe=source
                        )
 
 # ====================================================================================================================
 # Simple layout with dataframe and metrics comparing last month to last year
 # ====================================================================================================================
 
-# Load a Pandas dataframe and return 13 rows
-df = pd.read_csv('https://raw.githubusercontent.com/flyandlure/datasets/master/monthly-ecommerce-data.csv',
-                 skiprows=1,
-                 names=['Period', 'Sessions', 'Transactions', 'Conversion rate', 'Revenue', 'AOV']).head(13)
+# Load the first 13 rows
+df = pdf.read_source(metrics_source)
 
 # Add metrics
 metrics = [
@@ -106,10 +106,8 @@ payload = pdf.add_page(payload,
 # Simple layout with dataframe and metrics comparing last month to previous month
 # ====================================================================================================================
 
-# Load a Pandas dataframe and return 13 rows
-df = pd.read_csv('https://raw.githubusercontent.com/flyandlure/datasets/master/monthly-ecommerce-data.csv',
-                 skiprows=1,
-                 names=['Period', 'Sessions', 'Transactions', 'Conversion rate', 'Revenue', 'AOV']).head(13)
+# Load the first 13 rows
+df = pdf.read_source(metrics_source)
 
 # Add metrics
 metrics = [
@@ -161,10 +159,8 @@ payload = pdf.add_page(payload,
 # Simple layout with dataframe and no metrics comparison
 # ====================================================================================================================
 
-# Load a Pandas dataframe and return 13 rows
-df = pd.read_csv('https://raw.githubusercontent.com/flyandlure/datasets/master/monthly-ecommerce-data.csv',
-                 skiprows=1,
-                 names=['Period', 'Sessions', 'Transactions', 'Conversion rate', 'Revenue', 'AOV']).head(13)
+# Load the first 13 rows
+df = pdf.read_source(metrics_source)
 
 # Add metrics
 metrics = [
@@ -206,10 +202,8 @@ payload = pdf.add_page(payload,
 # Left commentary layout with dataframe and notification message
 # ====================================================================================================================
 
-# Load a Pandas dataframe and return 13 rows
-df = pd.read_csv('https://raw.githubusercontent.com/flyandlure/datasets/master/monthly-ecommerce-data.csv',
-                 skiprows=1,
-                 names=['Period', 'Sessions', 'Transactions', 'Conversion Rate', 'Revenue', 'AOV']).head(13)
+# Load the first 13 rows
+df = pdf.read_source(source)
 
 # Define commentary
 page_commentary = """
@@ -237,10 +231,8 @@ payload = pdf.add_page(payload,
 # Simple layout with dataframe
 # ====================================================================================================================
 
-# Load a Pandas dataframe and return 13 rows
-df = pd.read_csv('https://raw.githubusercontent.com/flyandlure/datasets/master/monthly-ecommerce-data.csv',
-                 skiprows=1,
-                 names=['Period', 'Sessions', 'Transactions', 'Conversion Rate', 'Revenue', 'AOV']).head(13)
+# Load the first 13 rows
+df = pdf.read_source(source)
 
 # Define message
 page_message = {'message': 'This is a page message', 'style': 'danger'}
@@ -258,21 +250,18 @@ payload = pdf.add_page(payload,
 # Simple layout with dataframe and visualisation
 # ====================================================================================================================
 
-# Load a Pandas dataframe and return 13 rows
-df = pd.read_csv('https://raw.githubusercontent.com/flyandlure/datasets/master/monthly-ecommerce-data.csv',
-                 skiprows=1,
-                 names=['Period', 'Sessions', 'Transactions', 'Conversion Rate', 'Revenue', 'AOV']).head(13)
+# Load the first 13 rows
+df = pdf.read_source(source)
 
 # Define commentary
 page_commentary = """
-To add a visualisation you need to use either the "plot" or "left-commentary" layouts, save the image to a file and 
-pass in the filename to the "page_visualisation" argument. You will want to tweak the image size so it sits perfectly on your report page.
+To add a visualisation you need to use either the "plot" or "left-commentary" layouts and pass the figure, or the 
+filename of a saved image, to the "page_visualisation" argument. You will want to tweak the image size so it sits perfectly on your report page.
 """
 
-# Generate a visualisation and save the image
+# Generate a visualisation
 sns.set(rc={'figure.figsize': (15, 6)})
 line_plot = sns.lineplot(x='Period', y='Sessions', data=df)
-line_plot.figure.savefig("lineplot.png")
 
 # Add the dataframe to the payload
 payload = pdf.add_page(payload,
@@ -281,7 +270,7 @@ payload = pdf.add_page(payload,
                        page_title='Plot layout, visualisation, commentary',
                        page_dataframe=df,
                        page_commentary=page_commentary,
-                       page_visualisation='lineplot.png',
+                       page_visualisation=line_plot.figure,
                        )
 
 # ====================================================================================================================
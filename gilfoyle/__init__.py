@@ -0,0 +1,6 @@
+def __getattr__(name):
+    # Imported on first use, so importing gilfoyle.report does not load multiprocessing
+    if name == 'render_many':
+        from gilfoyle.batch import render_many
+        return render_many
+    raise AttributeError("module 'gilfoyle' has no attribute " + repr(name))
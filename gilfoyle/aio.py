@@ -0,0 +1,190 @@
+"""
+Asyncio rendering
+
+Renders reports from asyncio code in a thread or process pool, with a limit on concurrent renders and on
+the number of renders waiting for a slot, so that slow reports do not block the event loop or starve other
+requests.
+"""
+
+import asyncio
+import collections
+import copy
+import os
+import threading
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from gilfoyle.cache import write_output
+
+
+class RenderQueueFull(RuntimeError):
+    """Raised when a render is requested while the renderer's queue is already full."""
+
+
+def render_bytes(report, payload, output='pdf'):
+    """Render a report to bytes, whatever its output is set to. Runs inside an executor.
+
+    Args:
+        report: Report.
+        payload: Dictionary payload.
+        output (optional, string): Output format, pdf or html.
+
+    Returns:
+        bytes: Rendered report.
+    """
+
+    report = copy.copy(report)
+    report.output = None
+    return report.create_report(payload, output=output)
+
+
+class AsyncRenderer:
+    """Runs report renders in an executor on behalf of asyncio code.
+
+    At most max_concurrency reports render at once and up to max_queue more wait for a slot. Further
+    requests raise RenderQueueFull straight away, so a service can shed load instead of queueing
+    without limit. A render that times out or is cancelled while waiting gives up its place in the
+    queue. One that is already running cannot be interrupted, so it keeps its slot until it finishes,
+    and the executor is never asked to run more renders than it has workers.
+
+    Args:
+        max_concurrency (optional, int): Number of reports rendered at once. Defaults to the number of CPUs.
+        max_queue (optional, int): Number of renders allowed to wait for a slot.
+        executor (optional): 'process', 'thread', or a concurrent.futures.Executor to run renders in.
+            Defaults to processes, as WeasyPrint holds the GIL while it lays out a PDF, so renders in
+            threads do not run in parallel. Threads suit HTML output and avoid pickling the payload.
+
+    Usage:
+        renderer = AsyncRenderer(max_concurrency=4, max_queue=32, executor='process')
+        pdf_bytes = await pdf.create_report_async(payload, timeout=30, renderer=renderer)
+    """
+
+    def __init__(self, max_concurrency=None, max_queue=100, executor='process'):
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+        if isinstance(executor, Executor):
+            self.executor = executor
+        elif executor == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                               thread_name_prefix='gilfoyle-render')
+        elif executor == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=self.max_concurrency)
+        else:
+            raise ValueError('Unsupported executor ' + repr(executor) + ', use thread, process or an Executor')
+
+    @property
+    def queued(self):
+        """Number of renders waiting for a slot."""
+
+        return len(self._waiters)
+
+    async def _acquire(self):
+        with self._lock:
+            if self.active < self.max_concurrency and not self._waiters:
+                self.active += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                raise RenderQueueFull('Render queue is full (' + str(self.max_queue) + ' waiting)')
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # Handed the slot just before being cancelled. A cancelled waiter is passed over by _wake.
+            if not waiter.cancelled():
+                self._release()
+            raise
+
+    def _release(self, future=None):
+        """Hand a finished render's slot to the next waiter. Called from executor threads."""
+
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    try:
+                        waiter.get_loop().call_soon_threadsafe(self._wake, waiter)
+                        return
+                    except RuntimeError:
+                        # The waiter's event loop has been closed
+                        continue
+            self.active -= 1
+
+    def _wake(self, waiter):
+        if waiter.done():
+            # Cancelled after being handed the slot
+            self._release()
+        else:
+            waiter.set_result(None)
+
+    async def _render(self, report, payload, output):
+        await self._acquire()
+
+        try:
+            future = self.executor.submit(render_bytes, report, payload, output)
+        except BaseException:
+            self._release()
+            raise
+
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def render(self, report, payload, output='pdf', timeout=None):
+        """Render a report without blocking the event loop.
+
+        Args:
+            report: Report. The rendered report is also written to its output, unless that is None.
+            payload: Dictionary payload.
+            output (optional, string): Output format, pdf or html.
+            timeout (optional, float): Seconds to wait for a slot and the render before raising asyncio.TimeoutError.
+
+        Returns:
+            bytes: Rendered report.
+        """
+
+        data = await asyncio.wait_for(self._render(report, payload, output), timeout)
+
+        if report.output is not None:
+            await asyncio.get_running_loop().run_in_executor(None, write_output, data, report.output)
+
+        return data
+
+    def shutdown(self, wait=True):
+        """Shut down the executor.
+
+        Args:
+            wait (optional, bool): Wait for running renders to finish.
+        """
+
+        self.executor.shutdown(wait=wait)
+
+
+# Renderer used by Report.create_report_async when none is given
+_RENDERER = None
+_RENDERER_LOCK = threading.Lock()
+
+
+def get_renderer():
+    """Return the shared renderer, a process pool with one slot per CPU, creating it on first use.
+
+    Returns:
+        AsyncRenderer: Shared renderer.
+    """
+
+    global _RENDERER
+
+    if _RENDERER is None:
+        with _RENDERER_LOCK:
+            if _RENDERER is None:
+                _RENDERER = AsyncRenderer()
+
+    return _RENDERER
@@ -0,0 +1,181 @@
+"""
+Batch rendering
+
+Renders many reports at once in a pool of worker processes.
+"""
+
+import copy
+import os
+import pickle
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from gilfoyle.cache import write_output
+
+
+def _warm_worker(configs):
+    """Load templates and stylesheets into a worker's caches before it renders any report.
+
+    Args:
+        configs: List of (template, base_url, allow_network, cache_stylesheets) tuples used by the jobs.
+    """
+
+    from gilfoyle import report
+
+    path = os.path.dirname(report.__file__)
+    for template, base_url, allow_network, cache_stylesheets in configs:
+        try:
+            report.get_environment(path).get_template(template)
+            if cache_stylesheets:
+                report.get_stylesheets(base_url, allow_network)
+        except Exception:
+            # A bad template surfaces as an error on the jobs that use it
+            pass
+
+
+def _render_job(job, output):
+    """Render a pickled (Report, payload) job inside a worker.
+
+    Args:
+        job: (Report, payload) tuple pickled with the highest protocol.
+        output: Output format, pdf or html.
+
+    Returns:
+        dict: Rendered bytes when the report output is None, job timing and error.
+    """
+
+    start = time.perf_counter()
+    data = None
+
+    try:
+        report, payload = pickle.loads(job)
+        data = report.create_report(payload, output=output)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+
+    return {'data': data, 'seconds': time.perf_counter() - start, 'error': error}
+
+
+def _run_pool(jobs, output, workers, configs):
+    """Submit pickled jobs to a new process pool and collect their results.
+
+    Args:
+        jobs: Dictionary of pickled jobs keyed by job index.
+        output: Output format, pdf or html.
+        workers: Number of worker processes.
+        configs: Template and stylesheet configurations to warm in each worker.
+
+    Returns:
+        tuple: Results keyed by job index, and the indexes lost to a crashed worker.
+    """
+
+    results = {}
+    crashed = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker, initargs=(configs,)) as executor:
+        futures = {index: executor.submit(_render_job, job, output) for index, job in jobs.items()}
+        for index, future in futures.items():
+            try:
+                results[index] = future.result()
+            except BrokenProcessPool:
+                crashed.append(index)
+            except Exception:
+                results[index] = {'data': None, 'seconds': 0.0, 'error': traceback.format_exc()}
+
+    return results, crashed
+
+
+def _run_isolated(jobs, output, workers, configs):
+    """Run each job in its own single-worker process pool, so a job that crashes its worker only fails itself.
+
+    Args:
+        jobs: Dictionary of pickled jobs keyed by job index.
+        output: Output format, pdf or html.
+        workers: Number of pools running at once.
+        configs: Template and stylesheet configurations to warm in each worker.
+
+    Returns:
+        dict: Results keyed by job index.
+    """
+
+    def run(index):
+        completed, crashed = _run_pool({index: jobs[index]}, output, 1, configs)
+        if crashed:
+            return {'data': None, 'seconds': 0.0, 'error': 'Worker process terminated while rendering the report'}
+        return completed[index]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        return dict(zip(jobs, executor.map(run, jobs)))
+
+
+def render_many(jobs, workers=None, output='pdf'):
+    """Render many reports in parallel using a pool of worker processes.
+
+    Each worker loads the templates, and the parsed stylesheets of reports using cache_stylesheets,
+    before rendering. A report that raises, or a worker that crashes, only fails its own job.
+    Reports whose output is a file object are rendered to bytes in the worker and written to the
+    file object in the calling process.
+
+    Args:
+        jobs: Iterable of (Report, payload) pairs. Each report is written to its own output, or returned
+            as bytes in data when its output is None.
+        workers (optional, int): Number of worker processes. Defaults to the number of CPUs.
+        output (optional, string): Output format, pdf or html.
+
+    Returns:
+        list: One dictionary per job, in job order, i.e.
+
+            {'output': 'client-1.pdf',
+             'data': None,
+             'seconds': 1.27,
+             'error': None}
+
+    Usage:
+        jobs = [(report.Report(output=client + '.pdf'), payloads[client]) for client in clients]
+        results = render_many(jobs, workers=8)
+        failed = [result for result in results if result['error']]
+    """
+
+    results = {}
+    pickled = {}
+    outputs = []
+    configs = set()
+
+    for index, (report, payload) in enumerate(jobs):
+        outputs.append(report.output)
+        configs.add((report.template, report.base_url, report.allow_network, report.cache_stylesheets))
+
+        # File objects cannot be shared with a worker, so their reports are rendered to bytes
+        if hasattr(report.output, 'write'):
+            report = copy.copy(report)
+            report.output = None
+
+        try:
+            pickled[index] = pickle.dumps((report, payload), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            results[index] = {'data': None, 'seconds': 0.0, 'error': traceback.format_exc()}
+
+    workers = min(workers or os.cpu_count() or 1, max(len(pickled), 1))
+    configs = sorted(configs, key=repr)
+
+    if pickled:
+        completed, crashed = _run_pool(pickled, output, workers, configs)
+        results.update(completed)
+
+        # A crash fails every job still pending in the pool, so each gets another attempt on its own
+        if crashed:
+            results.update(_run_isolated({index: pickled[index] for index in crashed}, output, workers, configs))
+
+    for index, target in enumerate(outputs):
+        result = results[index]
+        if hasattr(target, 'write') and result['data'] is not None:
+            try:
+                write_output(result['data'], target)
+            except Exception:
+                result['error'] = traceback.format_exc()
+            result['data'] = None
+
+    return [dict(output=outputs[index], **results[index]) for index in range(len(outputs))]
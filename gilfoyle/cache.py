@@ -0,0 +1,229 @@
+"""
+Render cache
+
+Content-addressed cache of rendered reports, so that a report whose payload, templates and assets have not
+changed since a previous run is copied from disk instead of being rendered again.
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+
+def get_cache_dir(*subdirs):
+    """Return the on-disk cache directory used by Gilfoyle, creating it if required.
+
+    The location defaults to ~/.cache/gilfoyle and can be changed by setting the
+    GILFOYLE_CACHE_DIR environment variable.
+
+    Args:
+        subdirs: Optional sub-directories to append, i.e. 'jinja'
+
+    Returns:
+        string: Path to the cache directory, or None if it cannot be created.
+    """
+
+    root = os.environ.get('GILFOYLE_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'gilfoyle')
+    path = os.path.join(root, *subdirs)
+
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+
+    return path
+
+
+def write_output(data, target):
+    """Write rendered bytes to a path or a binary or text file object.
+
+    Args:
+        data: Rendered bytes. Text file objects receive them decoded as UTF-8.
+        target: Path or writable file object.
+    """
+
+    if not hasattr(target, 'write'):
+        with open(target, 'wb') as f:
+            f.write(data)
+    elif isinstance(target, io.TextIOBase):
+        target.write(data.decode('utf-8'))
+    else:
+        target.write(data)
+
+
+class RenderCache:
+    """Local disk cache of rendered PDF and HTML files, keyed by a hash of everything that affects the output.
+
+    The least recently used entries are evicted once the cache grows beyond max_size bytes.
+
+    Args:
+        directory (optional, string): Cache directory. Defaults to ~/.cache/gilfoyle/renders
+        max_size (optional, int): Maximum size of the cache in bytes.
+
+    Usage:
+        pdf = report.Report(output='example.pdf', cache=RenderCache(max_size=1024 ** 3))
+    """
+
+    def __init__(self, directory=None, max_size=512 * 1024 * 1024):
+        self.directory = directory or get_cache_dir('renders')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def __getstate__(self):
+        # Locks cannot be pickled, i.e. when a report is sent to a render_many worker
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key, target):
+        """Copy a cached render to the target if the key is in the cache.
+
+        Args:
+            key: Cache key.
+            target: Path or writable file object to copy the cached render to.
+
+        Returns:
+            bool: True on a cache hit.
+        """
+
+        path = self._get_path(key)
+
+        try:
+            if hasattr(target, 'write'):
+                with open(path, 'rb') as f:
+                    write_output(f.read(), target)
+            else:
+                shutil.copyfile(path, target)
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(self, key, source):
+        """Store a rendered file in the cache and evict the least recently used entries if it is full.
+
+        Args:
+            key: Cache key.
+            source: Path of the rendered file, or its bytes.
+        """
+
+        fd, temp = tempfile.mkstemp(dir=self.directory, prefix='.' + key, suffix='.tmp')
+
+        try:
+            if isinstance(source, bytes):
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(source)
+            else:
+                os.close(fd)
+                shutil.copyfile(source, temp)
+            os.replace(temp, self._get_path(key))
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            return
+
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in max_size bytes.
+
+        Returns:
+            int: Number of entries removed.
+        """
+
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+        removed = 0
+
+        for mtime, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            removed += 1
+
+        return removed
+
+    def clear(self):
+        """Remove every entry from the cache."""
+
+        for mtime, size, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        """Return the cache statistics.
+
+        Returns:
+            dict: Hits, misses, number of entries and size in bytes, i.e.
+
+                {'hits': 12, 'misses': 3, 'entries': 15, 'size': 7340032}
+        """
+
+        entries = self._entries()
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(entries),
+                'size': sum(entry[1] for entry in entries)}
+
+
+# File digests reused while a file's mtime and size are unchanged
+_FILE_DIGESTS = {}
+
+
+def get_file_digest(path):
+    """Return the SHA-256 digest of a file's contents.
+
+    Args:
+        path: File path.
+
+    Returns:
+        string: Hex digest.
+    """
+
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _FILE_DIGESTS.get(path)
+
+    if cached is None or cached[0] != signature:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        cached = _FILE_DIGESTS[path] = (signature, digest.hexdigest())
+
+    return cached[1]
@@ -0,0 +1,429 @@
+"""
+Render daemon
+
+A long-lived server that keeps worker processes warm, with Pandas, WeasyPrint, the templates, stylesheets and
+fonts already loaded, and renders reports sent to it over a local Unix socket. The client falls back to
+rendering in-process when no daemon is running.
+
+Usage:
+    python -m gilfoyle.daemon --workers 4
+"""
+
+import argparse
+import copy
+import errno
+import os
+import pickle
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Messages are pickles prefixed with their length as an unsigned 64-bit big-endian integer
+HEADER = struct.Struct('>Q')
+
+# Credentials of the process at the other end of a Unix socket on Linux: pid, uid and gid
+PEER_CREDENTIALS = struct.Struct('3i')
+
+# Template configurations warmed in every worker: (template, base_url, allow_network, cache_stylesheets)
+WARM_CONFIGS = [
+    ('assets/template.html', '.', True, True),
+    ('assets/template.html', '.', False, True),
+]
+
+
+def get_runtime_dir():
+    """Return a directory only the current user can access, creating it if required.
+
+    Uses $XDG_RUNTIME_DIR when it is set, and otherwise a gilfoyle-<uid> directory in the temp directory,
+    which must be a real directory owned by the current user with no group or other permissions.
+
+    Returns:
+        string: Directory path.
+    """
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return runtime_dir
+
+    path = os.path.join(tempfile.gettempdir(), 'gilfoyle-' + str(os.getuid()))
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+
+    # Another user could have created the directory first, or replaced it with a symlink
+    status = os.lstat(path)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or status.st_mode & 0o077:
+        raise PermissionError('Render daemon directory ' + path + ' is not private to the current user')
+
+    return path
+
+
+def get_socket_path():
+    """Return the daemon's socket path, set by GILFOYLE_SOCKET or in the current user's private runtime directory.
+
+    Returns:
+        string: Socket path.
+    """
+
+    return os.environ.get('GILFOYLE_SOCKET') or os.path.join(get_runtime_dir(), 'gilfoyle.sock')
+
+
+def get_peer_uid(sock):
+    """Return the user id of the process at the other end of a Unix socket.
+
+    Args:
+        sock: Connected Unix socket.
+
+    Returns:
+        int: User id, or None where the platform does not report peer credentials.
+    """
+
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+
+    pid, uid, gid = PEER_CREDENTIALS.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                                            PEER_CREDENTIALS.size))
+    return uid
+
+
+def send_message(sock, message):
+    """Send a length-prefixed pickle over a socket.
+
+    Args:
+        sock: Connected socket.
+        message: Picklable object.
+    """
+
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError('Connection closed after ' + str(received) + ' of ' + str(size) + ' bytes')
+        received += count
+
+    return buffer
+
+
+def recv_message(sock):
+    """Receive a length-prefixed pickle from a socket.
+
+    Args:
+        sock: Connected socket.
+
+    Returns:
+        Unpickled message.
+    """
+
+    size, = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    return pickle.loads(_recv_exactly(sock, size))
+
+
+"""
+Server
+"""
+
+
+def _warm_worker(configs):
+    """Load the heavy imports, templates, stylesheets and fonts, and lay out one page to warm the font stack."""
+
+    from gilfoyle import batch
+    from gilfoyle import report
+
+    batch._warm_worker(configs)
+
+    try:
+        report.get_font_config()
+        pdf = report.Report(output=None, cache_stylesheets=True, allow_network=False)
+        pdf.create_report(pdf.add_page(pdf.get_payload(), page_type='chapter', page_title='Warm up'))
+    except Exception:
+        # Renders report their own errors, warming up is best effort
+        pass
+
+
+def _render_job(job):
+    """Render a pickled (Report, payload, output) job inside a worker and return the report bytes."""
+
+    report, payload, output = pickle.loads(job)
+    return report.create_report(payload, output=output)
+
+
+def _is_listening(socket_path):
+    """Return True if a process accepts connections on a Unix socket."""
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(1.0)
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        except socket.timeout:
+            # The listening process has a full backlog
+            return True
+
+    return True
+
+
+class RenderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server handing each rendering request to a pool of warm worker processes.
+
+    The socket is only accessible to the user running the daemon, as requests are unpickled, and
+    connections from processes of other users are closed unread where the platform reports them. A
+    socket left behind by a daemon that exited is replaced, but the server refuses to start while
+    another process is listening on the socket path.
+
+    Args:
+        socket_path (optional, string): Path of the Unix socket. Defaults to get_socket_path().
+        workers (optional, int): Number of worker processes. Defaults to the number of CPUs.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path=None, workers=None):
+        self.socket_path = socket_path or get_socket_path()
+        self.workers = workers or os.cpu_count() or 1
+        self.started = time.time()
+        self.rendered = 0
+        self._lock = threading.Lock()
+
+        # Only a stale socket left behind by a daemon that exited is replaced
+        if os.path.lexists(self.socket_path):
+            if not stat.S_ISSOCK(os.lstat(self.socket_path).st_mode):
+                raise FileExistsError(errno.EEXIST, 'Render daemon socket path is not a socket', self.socket_path)
+            if _is_listening(self.socket_path):
+                raise OSError(errno.EADDRINUSE, 'Another process is listening on the render daemon socket',
+                              self.socket_path)
+            os.remove(self.socket_path)
+
+        self.executor = self._create_executor()
+
+        # Restrict the socket to the current user before it starts listening
+        umask = os.umask(0o177)
+        try:
+            super().__init__(self.socket_path, RenderHandler)
+        finally:
+            os.umask(umask)
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker, initargs=(WARM_CONFIGS,))
+
+    def render(self, job):
+        """Render a pickled job in the worker pool, replacing the pool if a worker has crashed.
+
+        Args:
+            job: Pickled (Report, payload, output) tuple, where the Report output is None.
+
+        Returns:
+            bytes: Rendered report.
+        """
+
+        executor = self.executor
+
+        try:
+            data = executor.submit(_render_job, job).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self.executor is executor:
+                    self.executor = self._create_executor()
+            raise
+
+        with self._lock:
+            self.rendered += 1
+
+        return data
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class RenderHandler(socketserver.BaseRequestHandler):
+    """Handles one client connection: a ping, or a render job answered with the report bytes."""
+
+    def handle(self):
+        start = time.perf_counter()
+
+        if get_peer_uid(self.request) not in (None, os.getuid()):
+            return
+
+        try:
+            request = recv_message(self.request)
+        except (ConnectionError, pickle.UnpicklingError, struct.error):
+            return
+
+        if not isinstance(request, dict):
+            response = {'data': None,
+                        'error': 'Invalid request of type ' + type(request).__name__ + ', expected a dictionary',
+                        'seconds': time.perf_counter() - start}
+        elif request.get('command') == 'ping':
+            response = {'ok': True,
+                        'pid': os.getpid(),
+                        'workers': self.server.workers,
+                        'rendered': self.server.rendered,
+                        'uptime': time.time() - self.server.started}
+        else:
+            try:
+                response = {'data': self.server.render(request['job']), 'error': None}
+            except Exception:
+                response = {'data': None, 'error': traceback.format_exc()}
+            response['seconds'] = time.perf_counter() - start
+
+        try:
+            send_message(self.request, response)
+        except OSError:
+            # The client gave up waiting
+            pass
+
+
+def serve(socket_path=None, workers=None):
+    """Run the render daemon until it is interrupted or sent SIGTERM.
+
+    Args:
+        socket_path (optional, string): Path of the Unix socket. Defaults to get_socket_path().
+        workers (optional, int): Number of worker processes. Defaults to the number of CPUs.
+    """
+
+    server = RenderServer(socket_path, workers)
+
+    # Start the workers now, so the first job does not pay for warming them up
+    for future in [server.executor.submit(os.getpid) for _ in range(server.workers)]:
+        future.result()
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    print('Gilfoyle render daemon listening on ' + server.socket_path + ' with ' + str(server.workers) + ' workers')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+"""
+Client
+"""
+
+
+class RenderError(RuntimeError):
+    """Raised when the daemon fails to render a report, with the worker's traceback as the message."""
+
+
+def _connect(socket_path, timeout):
+    """Connect to the daemon, checking it runs as the current user before anything is sent or unpickled."""
+
+    socket_path = socket_path or get_socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+
+    try:
+        sock.connect(socket_path)
+        uid = get_peer_uid(sock)
+        if uid is None:
+            uid = os.stat(socket_path).st_uid
+        if uid != os.getuid():
+            raise PermissionError('Render daemon socket ' + socket_path + ' belongs to another user')
+    except OSError:
+        sock.close()
+        raise
+
+    return sock
+
+
+def ping(socket_path=None, timeout=1.0):
+    """Return the status of the render daemon, or None if it is not running.
+
+    Args:
+        socket_path (optional, string): Path of the Unix socket. Defaults to get_socket_path().
+        timeout (optional, float): Seconds to wait for a reply.
+
+    Returns:
+        dict: Daemon process id, workers, reports rendered and uptime in seconds.
+    """
+
+    try:
+        with _connect(socket_path, timeout) as sock:
+            send_message(sock, {'command': 'ping'})
+            return recv_message(sock)
+    except (OSError, ConnectionError):
+        return None
+
+
+def render(report, payload, output='pdf', socket_path=None, timeout=None, fallback=True):
+    """Render a report in the daemon, or in this process if no daemon is running.
+
+    Args:
+        report: Report. The rendered report is also written to its output, unless that is None.
+        payload: Dictionary payload.
+        output (optional, string): Output format, pdf or html.
+        socket_path (optional, string): Path of the Unix socket. Defaults to get_socket_path().
+        timeout (optional, float): Seconds to wait for the daemon to render the report.
+        fallback (optional, bool): Render in this process when the daemon cannot be reached.
+
+    Returns:
+        bytes: Rendered report.
+
+    Usage:
+        from gilfoyle import daemon
+
+        pdf_bytes = daemon.render(pdf, payload)
+    """
+
+    # The report is rendered to bytes and written to its output here, as file objects cannot be sent
+    target = report.output
+    report = copy.copy(report)
+    report.output = None
+
+    try:
+        sock = _connect(socket_path, timeout)
+    except OSError:
+        if not fallback:
+            raise
+        sock = None
+
+    if sock is None:
+        data = report.create_report(payload, output=output)
+    else:
+        with sock:
+            send_message(sock, {'job': pickle.dumps((report, payload, output), protocol=pickle.HIGHEST_PROTOCOL)})
+            response = recv_message(sock)
+        if response['error']:
+            raise RenderError(response['error'])
+        data = response['data']
+
+    if target is not None:
+        from gilfoyle.cache import write_output
+        write_output(data, target)
+
+    return data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the Gilfoyle render daemon.')
+    parser.add_argument('--socket', help='Unix socket path. Defaults to $GILFOYLE_SOCKET or a per-user '
+                                         'private directory.')
+    parser.add_argument('--workers', type=int, help='Number of worker processes. Defaults to the number of CPUs.')
+    args = parser.parse_args()
+
+    serve(args.socket, args.workers)
@@ -0,0 +1,118 @@
+"""
+Fonts
+
+Fontconfig set up shared by every WeasyPrint render, and the options used to embed fonts in PDFs. Gilfoyle
+points fontconfig at a configuration in its own cache directory, which adds the bundled fonts to the system
+fonts and keeps fontconfig's font cache somewhere writable, so new processes read the cache instead of
+scanning every font directory again.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from gilfoyle.cache import get_cache_dir
+
+# System fontconfig configurations, the first one found is included in Gilfoyle's
+SYSTEM_CONFIGS = [
+    '/etc/fonts/fonts.conf',
+    '/usr/local/etc/fonts/fonts.conf',
+    '/opt/homebrew/etc/fonts/fonts.conf',
+]
+
+FONTS_DIR = os.path.join(os.path.dirname(__file__), 'assets', 'fonts')
+
+CONFIG_TEMPLATE = '''<?xml version="1.0"?>
+<!DOCTYPE fontconfig SYSTEM "urn:fontconfig:fonts.dtd">
+<fontconfig>
+  <cachedir>{cache}</cachedir>
+  <include ignore_missing="yes">{system}</include>
+  <dir>{fonts}</dir>
+</fontconfig>
+'''
+
+_CONFIG_PATH = None
+_CONFIGURED = False
+_CONFIG_LOCK = threading.Lock()
+
+
+def _escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def configure_fontconfig():
+    """Point fontconfig at Gilfoyle's configuration, writing it on first use.
+
+    Fontconfig reads FONTCONFIG_FILE when WeasyPrint is imported and whenever a FontConfiguration is
+    created, so this is called before either. Nothing is changed when FONTCONFIG_FILE is already set,
+    on Windows, or when no system configuration or cache directory is available.
+
+    Returns:
+        string: Path of the configuration in use, or None if fontconfig is left as it is.
+    """
+
+    global _CONFIG_PATH, _CONFIGURED
+
+    if _CONFIGURED:
+        return _CONFIG_PATH
+
+    with _CONFIG_LOCK:
+        if _CONFIGURED:
+            return _CONFIG_PATH
+
+        _CONFIGURED = True
+
+        if os.environ.get('FONTCONFIG_FILE') or sys.platform == 'win32':
+            return None
+
+        system = next((path for path in SYSTEM_CONFIGS if os.path.isfile(path)), None)
+        directory = get_cache_dir('fontconfig')
+        if system is None or directory is None:
+            return None
+
+        config = CONFIG_TEMPLATE.format(cache=_escape(os.path.join(directory, 'cache')),
+                                        system=_escape(system),
+                                        fonts=_escape(FONTS_DIR))
+
+        # Installs in different places write different configurations, so each gets its own file
+        path = os.path.join(directory, 'fonts-' + hashlib.sha256(config.encode('utf-8')).hexdigest()[:16] + '.conf')
+
+        try:
+            if not os.path.isfile(path):
+                temp_path = path + '.' + str(os.getpid()) + '.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(config)
+                os.replace(temp_path, path)
+        except OSError:
+            return None
+
+        os.environ['FONTCONFIG_FILE'] = path
+        _CONFIG_PATH = path
+
+    return _CONFIG_PATH
+
+
+def get_pdf_options(weasyprint_version, full_fonts=False):
+    """Return the write_pdf options for embedding fonts in a PDF.
+
+    WeasyPrint already subsets fonts to the glyphs used by the report by default, without hinting
+    instructions from version 59, so the default options only state that explicitly. They differ from
+    WeasyPrint's defaults when full_fonts is set, to embed whole font files.
+
+    Args:
+        weasyprint_version: Installed WeasyPrint version, i.e. 62.3
+        full_fonts (optional, bool): Embed whole font files instead.
+
+    Returns:
+        dict: Keyword arguments for write_pdf.
+    """
+
+    major = weasyprint_version.split('.')[0] if weasyprint_version else ''
+
+    if not major.isdigit() or int(major) >= 59:
+        return {'full_fonts': full_fonts, 'hinting': False}
+    if int(major) >= 53:
+        return {'optimize_size': () if full_fonts else ('fonts',)}
+
+    # Earlier versions embed fonts through cairo, which always subsets them
+    return {}
@@ -0,0 +1,524 @@
+"""
+Images
+
+Embeds matplotlib figures and raw image bytes in report pages from memory, without writing them to disk,
+and deduplicates and downsamples the images of a report before they are embedded in the PDF.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import pickle
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from gilfoyle.cache import get_file_digest
+
+
+IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+FIGURE_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Shared pool rasterizing the figures added to report pages
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor():
+    """Return the thread pool used to serialize figures, creating it on first use.
+
+    Returns:
+        concurrent.futures.ThreadPoolExecutor: Shared executor.
+    """
+
+    global _EXECUTOR
+
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                               thread_name_prefix='gilfoyle-figures')
+
+    return _EXECUTOR
+
+
+def get_mime_type(data):
+    """Return the MIME type of raw image bytes from their signature.
+
+    Args:
+        data: PNG, JPEG, GIF or SVG bytes.
+
+    Returns:
+        string: MIME type, i.e. image/png
+    """
+
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+
+    if b'<svg' in data[:1024]:
+        return 'image/svg+xml'
+
+    raise ValueError('Unrecognised image data, expected PNG, JPEG, GIF or SVG bytes')
+
+
+def serialize_figure(figure, figure_format='png', dpi=None):
+    """Save a matplotlib figure to bytes in memory.
+
+    Args:
+        figure: Matplotlib figure, or a seaborn grid with a savefig method.
+        figure_format (optional, string): png or svg.
+        dpi (optional, int): Resolution of PNG figures. Defaults to the figure's own DPI.
+
+    Returns:
+        bytes: Image data.
+    """
+
+    buffer = io.BytesIO()
+    kwargs = {'format': figure_format, 'bbox_inches': 'tight'}
+
+    if dpi:
+        kwargs['dpi'] = dpi
+
+    # Drop the creation date from SVG output so the same figure always gives the same bytes
+    if figure_format == 'svg':
+        kwargs['metadata'] = {'Date': None}
+
+    figure.savefig(buffer, **kwargs)
+    return buffer.getvalue()
+
+
+class _FigurePickler(pickle.Pickler):
+    """Pickler that stops copies of a figure from being registered with pyplot when they are loaded."""
+
+    def __init__(self, file, protocol):
+        super().__init__(file, protocol)
+        self.protocol = protocol
+
+        from matplotlib.figure import Figure
+        self.figure_type = Figure
+
+    def reducer_override(self, obj):
+        if type(obj) is not self.figure_type:
+            return NotImplemented
+
+        # Figures open in pyplot are flagged to be opened in pyplot again when they are loaded
+        reduced = obj.__reduce_ex__(self.protocol)
+        state = {key: value for key, value in reduced[2].items() if not key.startswith('_restore_to_')}
+        return reduced[:2] + (state,) + reduced[3:]
+
+
+def snapshot_figure(figure):
+    """Return a pickled copy of a figure as it is now, so later drawing on the figure does not change it.
+
+    Args:
+        figure: Matplotlib figure, or a seaborn grid with a savefig method.
+
+    Returns:
+        bytes: Pickled figure, or None if the figure cannot be pickled.
+    """
+
+    buffer = io.BytesIO()
+    try:
+        _FigurePickler(buffer, pickle.HIGHEST_PROTOCOL).dump(figure)
+    except Exception:
+        return None
+    return buffer.getvalue()
+
+
+def serialize_snapshot(snapshot, figure_format='png', dpi=None):
+    """Save a figure pickled by snapshot_figure to bytes in memory.
+
+    Args:
+        snapshot: Pickled figure.
+        figure_format (optional, string): png or svg.
+        dpi (optional, int): Resolution of PNG figures.
+
+    Returns:
+        bytes: Image data.
+    """
+
+    return serialize_figure(pickle.loads(snapshot), figure_format, dpi)
+
+
+class InlineImage:
+    """An image held in memory and embedded in the report as a data URI.
+
+    Figures are copied when they are added and the copies are serialized in the background, so the
+    figures of a report are rasterized in parallel while the rest of the payload is built.
+
+    Args:
+        data: Image bytes, or a concurrent.futures.Future returning image bytes.
+        mime_type (optional, string): MIME type of the image. Detected from the bytes if not set.
+    """
+
+    __slots__ = ('_data', '_future', '_mime_type', '_uri')
+
+    def __init__(self, data, mime_type=None):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            self._data = bytes(data)
+            self._future = None
+        else:
+            self._data = None
+            self._future = data
+        self._mime_type = mime_type
+        self._uri = None
+
+    @classmethod
+    def from_figure(cls, figure, figure_format='png', dpi=None):
+        """Create an image from a matplotlib figure, serializing a copy of it in the shared thread pool.
+
+        The figure is pickled straight away, so drawing on it afterwards does not change the image.
+        Figures that cannot be pickled are serialized in the calling thread instead.
+
+        Args:
+            figure: Matplotlib figure, or a seaborn grid with a savefig method.
+            figure_format (optional, string): png or svg.
+            dpi (optional, int): Resolution of PNG figures. Defaults to the figure's own DPI.
+
+        Returns:
+            InlineImage: Image whose bytes are ready once the figure has been saved.
+        """
+
+        if figure_format not in FIGURE_FORMATS:
+            raise ValueError('Unsupported figure format ' + repr(figure_format) + ', use png or svg')
+
+        snapshot = snapshot_figure(figure)
+        if snapshot is None:
+            return cls(serialize_figure(figure, figure_format, dpi), FIGURE_FORMATS[figure_format])
+
+        future = get_executor().submit(serialize_snapshot, snapshot, figure_format, dpi)
+        return cls(future, FIGURE_FORMATS[figure_format])
+
+    @property
+    def data(self):
+        """Image bytes, waiting for the figure to be serialized if required."""
+
+        if self._data is None:
+            self._data = self._future.result()
+            self._future = None
+        return self._data
+
+    @property
+    def mime_type(self):
+        """MIME type of the image."""
+
+        if self._mime_type is None:
+            self._mime_type = get_mime_type(self.data)
+        return self._mime_type
+
+    def to_uri(self):
+        """Return the image as a data URI, encoding it on first use.
+
+        Returns:
+            string: data: URI of the image.
+        """
+
+        if self._uri is None:
+            self._uri = 'data:' + self.mime_type + ';base64,' + base64.b64encode(self.data).decode('ascii')
+        return self._uri
+
+    def __str__(self):
+        return self.to_uri()
+
+    def __getstate__(self):
+        # Pending figures are resolved so the image can be sent to another process
+        return {'_data': self.data, '_mime_type': self.mime_type}
+
+    def __setstate__(self, state):
+        self._data = state['_data']
+        self._future = None
+        self._mime_type = state['_mime_type']
+        self._uri = None
+
+    def __repr__(self):
+        if self._data is None:
+            return '<InlineImage pending>'
+        return '<InlineImage ' + (self._mime_type or 'image') + ' ' + str(len(self._data)) + ' bytes>'
+
+
+def to_image(image, figure_format='png', dpi=None):
+    """Return an image that can be placed in a page, wrapping figures and raw bytes in an InlineImage.
+
+    Args:
+        image: File path or os.PathLike, InlineImage, raw image bytes, or a matplotlib figure or axes.
+        figure_format (optional, string): Format to save figures in, png or svg.
+        dpi (optional, int): Resolution of PNG figures.
+
+    Returns:
+        Image path or InlineImage.
+    """
+
+    if isinstance(image, os.PathLike):
+        image = os.fsdecode(image)
+
+    if image is None or isinstance(image, (str, InlineImage)):
+        return image
+
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return InlineImage(image)
+
+    if hasattr(image, 'savefig'):
+        return InlineImage.from_figure(image, figure_format, dpi)
+
+    # Matplotlib axes, i.e. the return value of sns.lineplot()
+    if hasattr(image, 'get_figure'):
+        return InlineImage.from_figure(image.get_figure(), figure_format, dpi)
+
+    raise TypeError('Unsupported image type ' + type(image).__name__ + ', expected a path, bytes or a figure')
+
+
+"""
+Asset pipeline
+"""
+
+# Largest printed size of an image, in inches, for each page layout on a 16in x 9in page
+PRINTED_SIZES = {
+    'cover': (16, 9),
+    'plot': (16, None),
+    'columns': (8, None),
+    'rows': (12, None),
+    'left-commentary': (4, None),
+}
+
+# CSS pixels per inch, below which images without a width attribute would be shown smaller
+CSS_DPI = 96
+
+IMAGE_URL_SCHEME = 'gilfoyle-image:'
+
+PIL_FORMATS = {
+    'image/png': 'PNG',
+    'image/jpeg': 'JPEG',
+}
+
+
+def downsample(data, mime_type, size, dpi, jpeg_quality=90):
+    """Downsample a raster image to the pixels needed to print it at a given size and resolution.
+
+    Images that are already small enough, SVGs, and images Pillow cannot read are returned unchanged,
+    as are images that would not get any smaller.
+
+    Args:
+        data: Image bytes.
+        mime_type: MIME type of the image.
+        size: (width, height) in inches of the box the image is printed in. Height may be None, and
+            when set the image is scaled to cover the whole box.
+        dpi: Printed resolution.
+        jpeg_quality (optional, int): Quality used to re-encode JPEG images.
+
+    Returns:
+        bytes: Image data.
+    """
+
+    if mime_type not in PIL_FORMATS:
+        return data
+
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+
+    dpi = max(dpi, CSS_DPI)
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        width, height = image.size
+        scale = size[0] * dpi / width
+        if size[1]:
+            scale = max(scale, size[1] * dpi / height)
+
+        if scale >= 1:
+            return data
+
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+
+        image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        if mime_type == 'image/jpeg':
+            image.save(buffer, 'JPEG', quality=jpeg_quality, optimize=True)
+        else:
+            image.save(buffer, 'PNG', optimize=True)
+    except Exception:
+        # Corrupt or unusual images are embedded as supplied and left for WeasyPrint to report
+        return data
+
+    resized = buffer.getvalue()
+    return resized if len(resized) < len(data) else data
+
+
+class ImagePipeline:
+    """Fingerprints the images of a report so each unique image is downsampled and embedded once.
+
+    Images are served to WeasyPrint from memory under a gilfoyle-image: URL derived from their SHA-256
+    digest, so an image repeated on many pages is decoded once and written to the PDF once. The images
+    processed for a render are kept until the next one, which reuses those it still places, so the
+    pipeline never holds more than one render's images.
+
+    Args:
+        dpi (optional, int): Printed resolution images are downsampled to.
+        base_url (optional, string): Directory relative image paths are resolved against.
+
+    Usage:
+        pdf = report.Report(output='example.pdf', image_dpi=150)
+        pdf.create_report(payload)
+        pdf.image_pipeline.stats()
+    """
+
+    def __init__(self, dpi=150, base_url='.'):
+        self.dpi = dpi
+        self.base_url = base_url
+        self.images = 0
+        self.original_bytes = 0
+        self._resources = {}
+        self._urls = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _load(self, image):
+        """Return the digest, size and a bytes loader of a page image, or None if it is not local."""
+
+        if isinstance(image, InlineImage):
+            data = image.data
+            return hashlib.sha256(data).hexdigest(), len(data), lambda: data
+
+        if not isinstance(image, str) or not image:
+            return None
+
+        if image.startswith('file:'):
+            from urllib.request import url2pathname
+            path = url2pathname(image[len('file:'):])
+        elif re.match(r'^[a-zA-Z][a-zA-Z0-9.+-]+:', image) and not os.path.isabs(image):
+            # Remote and data: URLs are left to the URL fetcher
+            return None
+        else:
+            path = image if os.path.isabs(image) else os.path.join(self.base_url, image)
+
+        if not os.path.isfile(path):
+            return None
+
+        def read():
+            with open(path, 'rb') as f:
+                return f.read()
+
+        return get_file_digest(path), os.path.getsize(path), read
+
+    def get_url(self, image, size, render=None):
+        """Return the in-memory URL of a page image printed in a box of the given size.
+
+        Args:
+            image: Image path or InlineImage.
+            size: (width, height) in inches of the printed box.
+            render (optional, dict): Statistics, URLs and resources of the render in progress, as created
+                by prepare. The image is added to them.
+
+        Returns:
+            string: gilfoyle-image: URL, or the image unchanged if it is not a local image.
+        """
+
+        loaded = self._load(image)
+        if loaded is None:
+            return image
+
+        if render is None:
+            render = self._new_render()
+
+        digest, length, read = loaded
+        key = (digest, size)
+
+        render['images'] += 1
+        render['original_bytes'] += length
+        if key in render['urls']:
+            return render['urls'][key]
+
+        with self._lock:
+            url = self._urls.get(key)
+            resource = self._resources.get(url)
+
+        if resource is None:
+            data = read()
+            mime_type = get_mime_type(data)
+            data = downsample(data, mime_type, size, self.dpi)
+            url = IMAGE_URL_SCHEME + hashlib.sha256(data).hexdigest()
+            resource = (data, mime_type)
+
+        render['resources'][url] = resource
+        render['urls'][key] = url
+
+        return url
+
+    @staticmethod
+    def _new_render():
+        return {'images': 0, 'original_bytes': 0, 'urls': {}, 'resources': {}}
+
+    def prepare(self, payload):
+        """Return a copy of the payload whose local images point at fingerprinted in-memory resources.
+
+        The statistics are reset for each render, and images the payload no longer places are released.
+
+        Args:
+            payload: Extended payload dictionary.
+
+        Returns:
+            tuple: Payload, and the resources to serve to WeasyPrint keyed by URL.
+        """
+
+        render = self._new_render()
+        pages = []
+
+        for page in payload['pages']:
+            page = dict(page)
+            size = PRINTED_SIZES.get(page.get('page_layout'), PRINTED_SIZES['plot'])
+            if page.get('page_visualisation'):
+                page['page_visualisation'] = self.get_url(page['page_visualisation'], size, render)
+            if page.get('page_background'):
+                page['page_background'] = self.get_url(page['page_background'], PRINTED_SIZES['cover'], render)
+            pages.append(page)
+
+        with self._lock:
+            self.images = render['images']
+            self.original_bytes = render['original_bytes']
+            self._urls = render['urls']
+            self._resources = render['resources']
+
+        return dict(payload, pages=pages), render['resources']
+
+    def stats(self):
+        """Return the image statistics of the last render.
+
+        Returns:
+            dict: Images placed, unique images embedded, bytes supplied, bytes embedded and bytes saved, i.e.
+
+                {'images': 120, 'unique': 4, 'original_bytes': 52428800, 'embedded_bytes': 614400,
+                 'bytes_saved': 51814400}
+        """
+
+        with self._lock:
+            resources = self._resources
+            images = self.images
+            original_bytes = self.original_bytes
+
+        embedded = sum(len(body) for body, mime_type in resources.values())
+        return {'images': images,
+                'unique': len(resources),
+                'original_bytes': original_bytes,
+                'embedded_bytes': embedded,
+                'bytes_saved': original_bytes - embedded}
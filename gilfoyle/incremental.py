@@ -0,0 +1,111 @@
+"""
+Incremental rendering
+
+Keeps every page of a PDF report as a separate fragment, named by a fingerprint of the page, next to the
+report, with a manifest of the fingerprints in page order. Rendering the report again lays out only the
+pages whose fingerprint is new and merges the fragments into the report with gilfoyle.pdf.merge_pdfs,
+which requires the optional pypdf package: pip install pypdf
+"""
+
+import json
+import os
+
+MANIFEST_VERSION = 1
+
+
+def get_manifest_path(output):
+    """Return the path of the manifest kept next to a report.
+
+    Args:
+        output: Report path, i.e. example.pdf
+
+    Returns:
+        string: Manifest path, i.e. example.pdf.manifest.json
+    """
+
+    return output + '.manifest.json'
+
+
+def get_fragments_dir(output):
+    """Return the directory holding the page fragments of a report, creating it if required.
+
+    Args:
+        output: Report path, i.e. example.pdf
+
+    Returns:
+        string: Directory path, i.e. example.pdf.pages
+    """
+
+    path = output + '.pages'
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_manifest(output):
+    """Return the manifest of a report, or None if there is none or it was written by another version.
+
+    Args:
+        output: Report path.
+
+    Returns:
+        dict: Manifest, i.e. {'version': 1, 'settings': '9f2c...', 'pages': ['a41b...', ...], 'rendered': [3]}
+    """
+
+    try:
+        with open(get_manifest_path(output), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return None
+
+    return manifest
+
+
+def save_manifest(output, settings, fingerprints, rendered):
+    """Write the manifest of a report and delete the fragments of pages it no longer contains.
+
+    Args:
+        output: Report path.
+        settings: Digest of the report settings the fragments were rendered with.
+        fingerprints: Fingerprints of the pages, in page order.
+        rendered: Indexes of the pages laid out by this render.
+    """
+
+    manifest = {'version': MANIFEST_VERSION,
+                'settings': settings,
+                'pages': fingerprints,
+                'rendered': rendered}
+
+    path = get_manifest_path(output)
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temp_path, path)
+
+    directory = get_fragments_dir(output)
+    keep = set(fingerprint + '.pdf' for fingerprint in fingerprints)
+    for name in os.listdir(directory):
+        if name.endswith('.pdf') and name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def write_fragment(directory, fingerprint, data):
+    """Write the PDF of one page atomically.
+
+    Args:
+        directory: Fragments directory.
+        fingerprint: Page fingerprint.
+        data: PDF bytes.
+    """
+
+    path = os.path.join(directory, fingerprint + '.pdf')
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
@@ -0,0 +1,235 @@
+"""
+Offline assets
+
+Serves the stylesheets and fonts linked from the report templates out of the bundle shipped in
+gilfoyle/assets, so WeasyPrint never has to fetch them over the network when rendering a PDF.
+"""
+
+import os
+import re
+import sys
+import threading
+from urllib.parse import urljoin
+
+
+ASSETS_PATH = os.path.join(os.path.dirname(__file__), 'assets')
+
+# Remote URLs linked from template.html and the bundled files that replace them
+FIRA_SANS_URL = 'https://fonts.googleapis.com/css?family=Fira+Sans'
+BULMA_URL = 'https://unpkg.com/bulma@0.9.0/css/bulma.min.css'
+
+BUNDLED_URLS = {
+    FIRA_SANS_URL: 'css/fira-sans.css',
+    BULMA_URL: 'css/bulma.min.css',
+}
+
+MIME_TYPES = {
+    '.css': 'text/css',
+    '.ttf': 'font/ttf',
+    '.otf': 'font/otf',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
+}
+
+# Bundled asset bytes, loaded from disk once per process
+_RESOURCES = {}
+_RESOURCES_LOCK = threading.Lock()
+
+
+def path_to_url(path):
+    """Return the file:// URL of a local path.
+
+    Args:
+        path: Local file path.
+
+    Returns:
+        string: file:// URL.
+    """
+
+    from urllib.request import pathname2url
+
+    return urljoin('file:', pathname2url(os.path.abspath(path)))
+
+
+def get_bundled_resource(url):
+    """Return a bundled asset for a URL, reading it from disk on first use.
+
+    Args:
+        url: URL requested by WeasyPrint. Either one of the remote URLs in BUNDLED_URLS or a
+            file:// URL pointing inside gilfoyle/assets.
+
+    Returns:
+        tuple: (body, mime_type, url) of the bundled asset, or None if the URL is not bundled.
+    """
+
+    if url in _RESOURCES:
+        return _RESOURCES[url]
+
+    if url in BUNDLED_URLS:
+        path = os.path.join(ASSETS_PATH, BUNDLED_URLS[url])
+    elif url.startswith('file:'):
+        from urllib.request import url2pathname
+        path = os.path.abspath(url2pathname(url[len('file:'):].split('?')[0]))
+        if not path.startswith(ASSETS_PATH + os.sep):
+            return None
+    else:
+        return None
+
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, 'rb') as f:
+        body = f.read()
+
+    # Relative URLs inside bundled stylesheets (i.e. fonts) resolve against the local file
+    resource = (body, MIME_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream'), path_to_url(path))
+
+    with _RESOURCES_LOCK:
+        _RESOURCES[url] = resource
+
+    return resource
+
+
+def get_url_fetcher(resources=None, allow_network=True):
+    """Return a WeasyPrint URL fetcher that serves bundled assets from memory.
+
+    Args:
+        resources (optional, dict): Extra in-memory resources keyed by URL, as (body, mime_type) tuples.
+        allow_network (optional, bool): Set to False to refuse any remote URL that is not bundled.
+
+    Returns:
+        URL fetcher to pass to weasyprint.HTML or weasyprint.CSS.
+    """
+
+    resources = resources or {}
+
+    def resolve(url):
+        if url in resources:
+            body, mime_type = resources[url]
+            return body, mime_type, url
+
+        resource = get_bundled_resource(url)
+        if resource is None and not allow_network and not url.startswith(('file:', 'data:')):
+            raise ValueError('Gilfoyle is rendering offline and cannot fetch ' + url)
+
+        return resource
+
+    try:
+        from weasyprint.urls import URLFetcher
+        from weasyprint.urls import URLFetcherResponse
+    except ImportError:
+        # WeasyPrint before URLFetcher classes: fetchers are functions returning dictionaries
+        from weasyprint import default_url_fetcher
+
+        def url_fetcher(url, *args, **kwargs):
+            resource = resolve(url)
+            if resource is None:
+                return default_url_fetcher(url, *args, **kwargs)
+            body, mime_type, redirected_url = resource
+            return {'string': body, 'mime_type': mime_type, 'redirected_url': redirected_url}
+
+        return url_fetcher
+
+    class BundledURLFetcher(URLFetcher):
+        def fetch(self, url, headers=None):
+            resource = resolve(url)
+            if resource is None:
+                return super().fetch(url, headers)
+            body, mime_type, redirected_url = resource
+            return URLFetcherResponse(redirected_url, body, {'Content-Type': mime_type})
+
+    return BundledURLFetcher()
+
+
+"""
+Build the bundle
+"""
+
+
+def get_template_classes(path=ASSETS_PATH):
+    """Return the set of CSS classes used by the report templates.
+
+    Args:
+        path: Directory containing template.html and the templates folder.
+
+    Returns:
+        set: CSS class names.
+    """
+
+    classes = {'dataframe', 'table', 'is-striped', 'is-fullwidth'}
+
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            if name.endswith(('.html', '.tmpl')):
+                with open(os.path.join(root, name), encoding='utf-8') as f:
+                    source = f.read()
+                for value in re.findall(r'class=["\']([^"\']*)["\']', source):
+                    # Classes built from Jinja expressions, i.e. is-{{ page.page_message.style }}
+                    if '{{' in value:
+                        classes.update('is-' + style for style in ('primary', 'link', 'info', 'success',
+                                                                 'warning', 'danger', 'dark', 'light'))
+                        value = re.sub(r'\S*{{.*?}}\S*', '', value)
+                    classes.update(cls for cls in re.split(r'[\s.]+', value) if cls)
+
+    return classes
+
+
+def build_bulma_subset(source, target, classes=None):
+    """Write a copy of the Bulma stylesheet trimmed to the classes used by the templates.
+
+    Element-only rules are kept, as are rules whose selectors only reference used classes.
+
+    Args:
+        source: Path to the full bulma.css.
+        target: Path to write the trimmed stylesheet to.
+        classes (optional, set): CSS classes to keep. Defaults to those used by the templates.
+
+    Returns:
+        int: Size of the trimmed stylesheet in bytes.
+    """
+
+    import tinycss2
+
+    classes = classes or get_template_classes()
+
+    def keep_selector(selector):
+        # Classes excluded with :not() do not need to be used for the rule to apply
+        selector = re.sub(r':not\([^)]*\)', '', selector)
+        return all(cls in classes for cls in re.findall(r'\.(-?[_a-zA-Z][_a-zA-Z0-9-]*)', selector))
+
+    def trim(rules):
+        output = []
+        for rule in rules:
+            if rule.type == 'qualified-rule':
+                selectors = [s.strip() for s in tinycss2.serialize(rule.prelude).split(',')]
+                selectors = [s for s in selectors if keep_selector(s)]
+                if selectors:
+                    output.append(',\n'.join(selectors) + '{' + tinycss2.serialize(rule.content).strip() + '}')
+            elif rule.type == 'at-rule' and rule.lower_at_keyword == 'media' and rule.content:
+                inner = trim(tinycss2.parse_rule_list(rule.content, skip_comments=True, skip_whitespace=True))
+                if inner:
+                    output.append('@media' + tinycss2.serialize(rule.prelude) + '{' + '\n'.join(inner) + '}')
+        return output
+
+    with open(source, encoding='utf-8') as f:
+        rules = tinycss2.parse_stylesheet(f.read(), skip_comments=True, skip_whitespace=True)
+
+    css = '/*! bulma.io v0.9.0 | MIT License | github.com/jgthms/bulma */\n'
+    css += '/* Trimmed to the classes used by the Gilfoyle templates */\n'
+    css += '\n'.join(trim(rules)) + '\n'
+
+    with open(target, 'w', encoding='utf-8') as f:
+        f.write(css)
+
+    return len(css.encode('utf-8'))
+
+
+if __name__ == '__main__':
+    # python -m gilfoyle.offline path/to/bulma.css
+    size = build_bulma_subset(sys.argv[1], os.path.join(ASSETS_PATH, 'css', 'bulma.min.css'))
+    print('Wrote bulma.min.css (' + str(size) + ' bytes)')
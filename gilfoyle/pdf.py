@@ -0,0 +1,52 @@
+"""
+PDF merging
+
+Joins PDFs rendered separately, such as chunks of a report laid out in parallel processes or page fragments
+kept between renders, into one document. Requires the optional pypdf package: pip install pypdf
+"""
+
+import io
+import os
+
+
+def merge_pdfs(sources, target):
+    """Merge PDFs into one, keeping the metadata of the first and storing objects they share once.
+
+    WeasyPrint writes the report title and generator into each PDF's document information, which is
+    copied from the first source so the merged PDF carries the same metadata as a single render.
+
+    Args:
+        sources: PDF bytes or paths, in page order.
+        target: Path or binary file object to write the merged PDF to. Paths are replaced atomically.
+    """
+
+    try:
+        from pypdf import PdfReader
+        from pypdf import PdfWriter
+    except ImportError:
+        raise ImportError('Merging PDFs requires pypdf: pip install pypdf') from None
+
+    writer = PdfWriter()
+    metadata = None
+
+    for source in sources:
+        reader = PdfReader(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+        if metadata is None:
+            metadata = dict(reader.metadata or {})
+        writer.append(reader)
+
+    if metadata:
+        writer.add_metadata(metadata)
+
+    if hasattr(writer, 'compress_identical_objects'):
+        writer.compress_identical_objects()
+
+    if hasattr(target, 'write'):
+        if isinstance(target, io.TextIOBase):
+            raise ValueError('PDF output needs a path or a binary file object')
+        writer.write(target)
+        return
+
+    temp_path = target + '.' + str(os.getpid()) + '.tmp'
+    writer.write(temp_path)
+    os.replace(temp_path, target)
@@ -0,0 +1,197 @@
+"""
+Profiling
+
+Timings and counters for each phase of rendering a report, and for each page, with optional cProfile capture.
+"""
+
+import io
+import threading
+import time
+from contextlib import contextmanager
+from contextlib import nullcontext
+
+
+# Phases timed while a report is built and rendered, in the order they run
+PHASES = [
+    'read_source',
+    'format_dataframe',
+    'cache',
+    'images',
+    'jinja',
+    'stylesheets',
+    'html_parse',
+    'layout',
+    'write_pdf',
+    'write_html',
+    'merge_pdf',
+    'thumbnails',
+]
+
+
+class Profiler:
+    """Collects the time spent in each phase of building and rendering a report.
+
+    Pass a profiler to a Report to time format_dataframe in add_page, and Jinja rendering, HTML
+    parsing, layout (including the CSS cascade, which WeasyPrint runs as part of layout) and PDF
+    serialization in create_report. HTML output is rendered and written in one streaming pass, timed
+    as write_html. Each page gets a record of its tables, rows and images and the time spent
+    formatting its dataframe. Callbacks receive every phase and page as it is recorded, i.e. to feed
+    a metrics client.
+
+    Used as a context manager, the profiler also measures the total time of the block, and with
+    cprofile=True captures a cProfile of it.
+
+    Args:
+        callbacks (optional, list): Functions called with a dictionary for each recorded event, i.e.
+            {'event': 'phase', 'phase': 'layout', 'seconds': 1.92, 'page': None}
+        cprofile (optional, bool): Capture a cProfile of the block run inside the context manager.
+
+    Usage:
+        with Profiler(cprofile=True) as profiler:
+            pdf = report.Report(output='example.pdf', profiler=profiler)
+            payload = pdf.add_page(payload, ...)
+            pdf.create_report(payload)
+
+        profiler.stats()
+        profiler.print_cprofile(limit=20)
+    """
+
+    def __init__(self, callbacks=None, cprofile=False):
+        self.callbacks = list(callbacks or [])
+        self.cprofile = cprofile
+        self.phases = {}
+        self.pages = {}
+        self.seconds = None
+        self.profile = None
+        self._start = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if self.cprofile:
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self._start
+        if self.profile is not None:
+            self.profile.disable()
+
+    def __getstate__(self):
+        # Profilers sent to another process with a report start afresh there
+        return {'callbacks': self.callbacks, 'cprofile': False}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _emit(self, event):
+        for callback in self.callbacks:
+            callback(event)
+
+    @contextmanager
+    def phase(self, name, page=None):
+        """Time a block of code as part of a phase.
+
+        Args:
+            name: Phase name, i.e. layout
+            page (optional, int): Index of the page the time is spent on.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                phase = self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0})
+                phase['seconds'] += seconds
+                phase['calls'] += 1
+                if page is not None:
+                    record = self.pages.setdefault(page, {'page': page})
+                    record[name] = record.get(name, 0.0) + seconds
+            self._emit({'event': 'phase', 'phase': name, 'seconds': seconds, 'page': page})
+
+    def add_page(self, page, **counters):
+        """Record the counters of a page, i.e. its number of tables, rows and images.
+
+        Args:
+            page: Index of the page in the payload.
+            counters: Page counters and details.
+        """
+
+        with self._lock:
+            record = self.pages.setdefault(page, {'page': page})
+            record.update(counters)
+        self._emit(dict(record, event='page'))
+
+    def stats(self):
+        """Return the phase and page statistics.
+
+        Returns:
+            dict: Total seconds, phases in the order they run and page records in page order, i.e.
+
+                {'seconds': 4.1,
+                 'phases': {'jinja': {'seconds': 0.2, 'calls': 1}, 'layout': {'seconds': 3.1, 'calls': 1}},
+                 'pages': [{'page': 0, 'type': 'report', 'tables': 1, 'rows': 13, 'images': 0,
+                            'format_dataframe': 0.004}]}
+        """
+
+        order = {name: index for index, name in enumerate(PHASES)}
+        phases = sorted(self.phases.items(), key=lambda item: order.get(item[0], len(order)))
+        return {'seconds': self.seconds,
+                'phases': {name: dict(phase) for name, phase in phases},
+                'pages': [dict(self.pages[page]) for page in sorted(self.pages)]}
+
+    def slowest_pages(self, limit=10, phase='format_dataframe'):
+        """Return the pages that spent the longest in a phase.
+
+        Args:
+            limit (optional, int): Number of pages to return.
+            phase (optional, string): Phase to sort by.
+
+        Returns:
+            list: Page records, slowest first.
+        """
+
+        pages = [page for page in self.stats()['pages'] if phase in page]
+        return sorted(pages, key=lambda page: page[phase], reverse=True)[:limit]
+
+    def print_cprofile(self, sort='cumulative', limit=30):
+        """Return and print the cProfile statistics captured by the context manager.
+
+        Args:
+            sort (optional, string): pstats sort key.
+            limit (optional, int): Number of functions to show.
+
+        Returns:
+            string: Formatted statistics.
+        """
+
+        if self.profile is None:
+            raise ValueError('No cProfile was captured, use Profiler(cprofile=True) as a context manager')
+
+        import pstats
+
+        buffer = io.StringIO()
+        pstats.Stats(self.profile, stream=buffer).sort_stats(sort).print_stats(limit)
+        print(buffer.getvalue())
+        return buffer.getvalue()
+
+
+def get_phase(profiler, name, page=None):
+    """Return a context manager timing a phase, or one that does nothing when there is no profiler.
+
+    Args:
+        profiler: Profiler or None.
+        name: Phase name.
+        page (optional, int): Index of the page the time is spent on.
+
+    Returns:
+        Context manager.
+    """
+
+    if profiler is None:
+        return nullcontext()
+    return profiler.phase(name, page)
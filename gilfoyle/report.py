@@ -1,21 +1,236 @@
+import copy
+import hashlib
+import io
+import json
 import os
 import re
-import numpy as np
-import pandas as pd
-from weasyprint import HTML
-from jinja2 import Environment
-from jinja2 import FileSystemLoader
+import sys
+import threading
+from functools import lru_cache
+from functools import partial
+from gilfoyle.cache import get_cache_dir
+from gilfoyle.cache import get_file_digest
+from gilfoyle.cache import RenderCache
+from gilfoyle.cache import write_output
+from gilfoyle.fonts import configure_fontconfig
+from gilfoyle.fonts import get_pdf_options
+from gilfoyle.images import ImagePipeline
+from gilfoyle.images import InlineImage
+from gilfoyle.images import to_image
+from gilfoyle import incremental
+from gilfoyle.offline import BULMA_URL
+from gilfoyle.offline import FIRA_SANS_URL
+from gilfoyle.offline import get_url_fetcher
+from gilfoyle.pdf import merge_pdfs
+from gilfoyle.profiling import get_phase
+from gilfoyle.sources import DataSource
+from gilfoyle.sources import SourceCache
+from gilfoyle.stream import ReportStream
+from gilfoyle.tables import is_dataframe
+from gilfoyle.tables import LazyTable
+from gilfoyle.tables import TablePages
+from gilfoyle.tables import render_table
+from gilfoyle.tables import render_table_pages
+from gilfoyle.tables import trim
+from gilfoyle.thumbnails import render_thumbnails
+from gilfoyle.thumbnails import THUMBNAIL_WIDTH
+
+# NumPy, Pandas, Jinja and WeasyPrint are imported on the code paths that use them, so building
+# payloads or HTML reports never loads WeasyPrint. Run python -m benchmarks.bench_import to check.
+
+
+# Number of template chunks joined before each write when streaming HTML
+HTML_BUFFER_SIZE = 64
+
+# Template the cached stylesheets belong to
+DEFAULT_TEMPLATE = 'assets/template.html'
+
+# Jinja environments shared by every Report in the process, keyed by template path
+_ENVIRONMENTS = {}
+_ENVIRONMENTS_LOCK = threading.Lock()
+
+# Font configuration and the stylesheets parsed with it, kept per thread, as a WeasyPrint FontConfiguration
+# cannot be used by several renders at once
+_THREAD_STATE = threading.local()
+
+
+def get_environment(path):
+    """Return the shared Jinja environment for templates stored under a path.
+
+    Environments are created once per process and keep their compiled templates in
+    memory. Compiled bytecode is also written to disk so that new processes skip
+    compilation, and templates are reloaded automatically when their mtime changes.
+
+    Args:
+        path: Directory the templates are loaded from.
+
+    Returns:
+        Environment: Jinja environment.
+    """
+
+    path = os.path.abspath(path)
+    env = _ENVIRONMENTS.get(path)
+
+    if env is None:
+        from jinja2 import Environment
+        from jinja2 import FileSystemLoader
+        from jinja2 import FileSystemBytecodeCache
+
+        with _ENVIRONMENTS_LOCK:
+            env = _ENVIRONMENTS.get(path)
+            if env is None:
+                bytecode_dir = get_cache_dir('jinja')
+                env = Environment(loader=FileSystemLoader(path),
+                                  bytecode_cache=FileSystemBytecodeCache(bytecode_dir) if bytecode_dir else None,
+                                  auto_reload=True)
+                _ENVIRONMENTS[path] = env
+
+    return env
+
+
+def get_font_config():
+    """Return the WeasyPrint font configuration shared by every render in the current thread.
+
+    Fonts are resolved and loaded once per thread rather than once per render, and renders running
+    at the same time in a thread pool never share a configuration. Fontconfig is pointed at
+    Gilfoyle's configuration before WeasyPrint is first imported.
+
+    Returns:
+        FontConfiguration: WeasyPrint font configuration.
+    """
+
+    font_config = getattr(_THREAD_STATE, 'font_config', None)
+
+    if font_config is None:
+        configure_fontconfig()
+
+        try:
+            from weasyprint.text.fonts import FontConfiguration
+        except ImportError:
+            from weasyprint.fonts import FontConfiguration
+
+        font_config = _THREAD_STATE.font_config = FontConfiguration()
+
+    return font_config
+
+
+def get_stylesheets(base_url='.', allow_network=True):
+    """Return the base stylesheets of the default template, parsed once per thread.
+
+    The stylesheets are Fira Sans, Bulma and default.css, in the order template.html links them. Their
+    fonts are registered with the thread's font configuration, so they are parsed again in each thread.
+
+    Args:
+        base_url: Base URL used to resolve relative URLs in default.css.
+        allow_network (optional, bool): Set to False to refuse remote URLs that are not bundled.
+
+    Returns:
+        list: weasyprint.CSS objects.
+    """
+
+    key = (base_url, allow_network)
+    cache = vars(_THREAD_STATE).setdefault('stylesheets', {})
+    stylesheets = cache.get(key)
+
+    if stylesheets is None:
+        font_config = get_font_config()
+        from weasyprint import CSS
+
+        url_fetcher = get_url_fetcher(allow_network=allow_network)
+
+        with open(os.path.join(os.path.dirname(__file__), 'assets', 'css', 'default.css')) as f:
+            default_css = f.read()
+
+        stylesheets = [CSS(url=FIRA_SANS_URL, url_fetcher=url_fetcher, font_config=font_config),
+                       CSS(url=BULMA_URL, url_fetcher=url_fetcher, font_config=font_config),
+                       CSS(string=default_css, base_url=base_url, url_fetcher=url_fetcher,
+                           font_config=font_config)]
+        cache[key] = stylesheets
+
+    return stylesheets
+
+
+@lru_cache(maxsize=None)
+def get_weasyprint_version():
+    """Return the installed WeasyPrint version without importing WeasyPrint.
+
+    Returns:
+        string: Version, or None if it cannot be found.
+    """
+
+    try:
+        from importlib.metadata import version
+        return version('weasyprint')
+    except Exception:
+        return None
+
+
+def _render_pdf(report, payload):
+    """Lay out a payload and return the PDF bytes. Runs inside a worker process when rendering in parallel.
+
+    Args:
+        report: Report.
+        payload: Extended payload dictionary.
+
+    Returns:
+        bytes: PDF.
+    """
+
+    document = report._render_document(payload)
+    with get_phase(report.profiler, 'write_pdf'):
+        return document.write_pdf(**report._get_pdf_options())
+
+
+def is_array(value):
+    """Return True for Pandas series, dataframes and indexes and NumPy arrays, without importing either library.
+
+    Args:
+        value: Any value.
+
+    Returns:
+        bool: True if the value is a Pandas or NumPy container.
+    """
+
+    pandas = sys.modules.get('pandas')
+    numpy = sys.modules.get('numpy')
+
+    return (pandas is not None and isinstance(value, (pandas.Series, pandas.DataFrame, pandas.Index))) or \
+        (numpy is not None and isinstance(value, numpy.ndarray))
 
 
 class Report:
     def __init__(self,
                  output,
-                 template='assets/template.html',
-                 base_url='.'
+                 template=DEFAULT_TEMPLATE,
+                 base_url='.',
+                 allow_network=True,
+                 cache_stylesheets=False,
+                 lazy_tables=False,
+                 drop_table_source=False,
+                 table_renderer='pandas',
+                 cache=None,
+                 figure_format='png',
+                 figure_dpi=None,
+                 image_dpi=None,
+                 full_fonts=False,
+                 profiler=None
                  ):
         self.template = template
         self.output = output
         self.base_url = base_url
+        self.allow_network = allow_network
+        self.cache_stylesheets = cache_stylesheets
+        self.lazy_tables = lazy_tables
+        self.drop_table_source = drop_table_source
+        self.table_renderer = table_renderer
+        self.cache = RenderCache() if cache is True else cache
+        self.figure_format = figure_format
+        self.figure_dpi = figure_dpi
+        self.image_dpi = image_dpi
+        self.image_pipeline = ImagePipeline(image_dpi, base_url) if image_dpi else None
+        self.full_fonts = full_fonts
+        self.sources = SourceCache()
+        self.profiler = profiler
         self.payload = ''
         self.title = ''
         self.accent_background_color = ''
@@ -66,9 +281,14 @@ class Report:
                  page_metrics=None,
                  page_dataframe=None,
                  page_visualisation=None,
-                 page_background=None):
+                 page_background=None,
+                 page_rows=None):
         """Add a new page to the payload for the report.
 
+        With page_rows set, every row of the dataframe is shown, and a dataframe with more rows than fit
+        on one page continues on further pages, each repeating the table header. Continuation pages are
+        always rendered by the fast table renderer, as converting thousands of slices with to_html is slow.
+
         Args:
             payload: Current payload.
             page_type: Page type, i.e. cover, chapter, report
@@ -79,14 +299,101 @@ class Report:
             page_message: Page message dictionary
             page_notification: Page notification text
             page_metrics: Dictionary of page metrics
-            page_dataframe: Pandas dataframe with formatted headers
-            page_visualisation: Image of data visualisation to include.
-            page_background: Image path of cover background image.
+            page_dataframe: Pandas dataframe with formatted headers, or a DataSource read when the page is added,
+                which only reads the rows and columns the page shows when it sets no limit or columns.
+            page_visualisation: Image of data visualisation to include. A file path or pathlib.Path, PNG, JPEG
+                or SVG bytes, or a matplotlib figure, which is serialized in memory in the background.
+            page_background: Image of cover background image, as a file path, image bytes or figure.
+            page_rows (optional, int): Show every row of the dataframe, in pages of this many rows.
+                Continuation pages repeat the title, marked as continued, and the table header.
 
         Returns:
             dict: Current payload with new data appended.
         """
 
+        pages = self._create_pages(len(payload['pages']), page_type, page_title, page_layout, page_subheading,
+                                   page_commentary, page_message, page_notification, page_metrics, page_dataframe,
+                                   page_visualisation, page_background, page_rows)
+        payload['pages'].extend(pages)
+
+        return payload
+
+    def _create_pages(self,
+                      index,
+                      page_type,
+                      page_title,
+                      page_layout=None,
+                      page_subheading=None,
+                      page_commentary=None,
+                      page_message=None,
+                      page_notification=None,
+                      page_metrics=None,
+                      page_dataframe=None,
+                      page_visualisation=None,
+                      page_background=None,
+                      page_rows=None):
+        """Returns the pages added by add_page, more than one when page_rows splits the dataframe.
+
+        The arguments are those of add_page, with the position of the first page in the report, which
+        the profiler records the pages under, in place of the payload.
+
+        Args:
+            index: Position of the first page in the report.
+
+        Returns:
+            list: Page dictionaries.
+        """
+
+        max_rows = None if page_rows else 13
+
+        if isinstance(page_dataframe, DataSource):
+            with get_phase(self.profiler, 'read_source', index):
+                page_dataframe = self.sources.read(page_dataframe, max_rows, max_cols=10)
+
+        # Row slices of the dataframe, which are views rather than copies
+        tables = [page_dataframe]
+        if page_rows and is_dataframe(page_dataframe) and len(page_dataframe) > page_rows:
+            tables = [page_dataframe.iloc[start:start + page_rows]
+                      for start in range(0, len(page_dataframe), page_rows)]
+
+        if self.profiler:
+            for i, table in enumerate(tables):
+                shape = table.shape if is_dataframe(table) else (0, 0)
+                self.profiler.add_page(index + i,
+                                       type=page_type,
+                                       layout=page_layout,
+                                       title=page_title,
+                                       tables=int(table is not None),
+                                       rows=shape[0],
+                                       columns=shape[1],
+                                       images=0 if i else sum(image is not None and image != ''
+                                                              for image in (page_visualisation, page_background)))
+
+        # Lazy tables are only converted to HTML when the template renders them, and only hold a copy of
+        # the rows and columns they show, so the caller's dataframe is not kept alive by the payload
+        if self.lazy_tables and is_dataframe(page_dataframe) and len(tables) > 1:
+            # The pages of the table are formatted together when the first is rendered
+            visible = trim(page_dataframe, None, 10)
+            pages = TablePages([visible.iloc[start:start + page_rows] for start in range(0, len(visible), page_rows)],
+                               max_cols=10)
+            tables = [LazyTable(table, partial(pages.format, i), self.drop_table_source)
+                      for i, table in enumerate(pages.dataframes)]
+        elif self.lazy_tables and is_dataframe(page_dataframe):
+            formatter = partial(self.format_dataframe, renderer=self.table_renderer, max_rows=max_rows)
+            tables = [LazyTable(trim(page_dataframe, max_rows, 10), formatter, self.drop_table_source)]
+        elif len(tables) > 1:
+            # Every column is formatted once for the whole dataframe and then split into pages
+            with get_phase(self.profiler, 'format_dataframe', index):
+                tables = render_table_pages(page_dataframe, page_rows, max_cols=10)
+        else:
+            for i, table in enumerate(tables):
+                with get_phase(self.profiler, 'format_dataframe', index + i):
+                    tables[i] = self.format_dataframe(table, self.table_renderer, max_rows)
+
+        # Figures are saved in memory in parallel and embedded without a round-trip through the disk
+        page_visualisation = to_image(page_visualisation, self.figure_format, self.figure_dpi)
+        page_background = to_image(page_background, self.figure_format, self.figure_dpi)
+
         page = {'page_type': page_type,
                 'page_layout': page_layout,
                 'page_title': page_title,
@@ -95,27 +402,62 @@ class Report:
                 'page_message': page_message,
                 'page_notification': page_notification,
                 'page_metrics': page_metrics,
-                'page_dataframe': self.format_dataframe(page_dataframe),
+                'page_dataframe': tables[0],
                 'page_visualisation': page_visualisation,
                 'page_background': page_background,
                 }
-        payload['pages'].append(page)
-        return payload
+        pages = [page]
+
+        continued_title = '(continued)' if page_title is None else page_title + ' (continued)'
+
+        for table in tables[1:]:
+            pages.append({'page_type': page_type,
+                          'page_layout': page_layout,
+                          'page_title': continued_title,
+                          'page_subheading': page_subheading,
+                          'page_commentary': None,
+                          'page_message': None,
+                          'page_notification': None,
+                          'page_metrics': None,
+                          'page_dataframe': table,
+                          'page_visualisation': None,
+                          'page_background': None,
+                          })
+
+        return pages
+
+    def read_source(self, source):
+        """Returns the dataframe of a data source, reading identical sources once per report.
+
+        Args:
+            source: DataSource.
+
+        Returns:
+            DataFrame: Pandas dataframe holding only the columns, rows and limit of the source.
+        """
+
+        return self.sources.read(source)
 
     @staticmethod
-    def format_dataframe(dataframe):
+    def format_dataframe(dataframe, renderer='pandas', max_rows=13):
         """Returns the HTML of a reformatted dataframe for use in the report.
 
         Args:
             dataframe: Pandas dataframe.
+            renderer (optional, string): pandas to use DataFrame.to_html, or fast to use Gilfoyle's
+                vectorized table renderer, which produces lighter markup.
+            max_rows (optional, int): Maximum number of rows to show, or None for all rows.
 
         Returns:
             string: Pandas dataframe in HTML format.
         """
 
-        if isinstance(dataframe, pd.DataFrame):
+        if is_dataframe(dataframe):
+            if renderer == 'fast':
+                return render_table(dataframe, max_rows=max_rows, max_cols=10)
+
             formatted_df = dataframe.to_html(classes=['dataframe', 'table', 'is-striped', 'is-fullwidth'],
-                                             max_rows=13,
+                                             max_rows=max_rows,
                                              max_cols=10,
                                              index=False)
             return formatted_df
@@ -124,30 +466,50 @@ class Report:
     Load template
     """
 
-    def _get_template(self):
+    def _get_template(self, template=None):
         """Returns the defined Jinja template to populate.
 
+        Args:
+            template (optional): Template path. Defaults to the report template.
+
         Returns:
             HTML template.
         """
 
         path = os.path.dirname(__file__)
-        env = Environment(loader=FileSystemLoader(path))
-        template = env.get_template(self.template)
+        template = get_environment(path).get_template(template or self.template)
         return template
 
-    def _render_template(self, payload):
+    def _render_template(self, payload, **context):
         """Renders the payload in the Jinja template.
 
         Args:
             payload: Payload dictionary.
+            context: Additional template variables, i.e. external_stylesheets=True
 
         Returns:
             string: Rendered template.
         """
 
         template = self._get_template()
-        return template.render(payload)
+        return template.render(payload, **context)
+
+    def _get_accent_stylesheet(self, payload):
+        """Returns the per-report stylesheet holding the accent colour overrides.
+
+        Args:
+            payload: Extended payload dictionary.
+
+        Returns:
+            CSS: Parsed accent stylesheet.
+        """
+
+        font_config = get_font_config()
+        from weasyprint import CSS
+
+        path = os.path.dirname(__file__)
+        css = get_environment(path).get_template('assets/templates/accent.tmpl').render(payload)
+        return CSS(string=css, font_config=font_config)
 
     def _extend_payload(self, payload):
         """Extends the payload by appending additional values.
@@ -165,6 +527,23 @@ class Report:
 
         return payload
 
+    """
+    Stream pages
+    """
+
+    def stream(self, output='pdf', chunk_size=50):
+        """Returns a context manager that renders each page as it is added, instead of building a payload.
+
+        Args:
+            output (optional, string): Output format, pdf or html.
+            chunk_size (optional, int): Number of pages to lay out together when writing a PDF.
+
+        Returns:
+            ReportStream: Streaming report writer.
+        """
+
+        return ReportStream(self, output=output, chunk_size=chunk_size)
+
     """
     Save to HTML
     """
@@ -185,32 +564,431 @@ cl
         f.write(html)
         f.close()
 
+    def _write_html(self, payload, target):
+        """Streams the rendered template to a path or file object in chunks, without building one string.
+
+        Args:
+            payload: Extended payload dictionary.
+            target: Path, or binary or text file object. Binary targets receive UTF-8.
+        """
+
+        stream = self._get_template().stream(payload)
+        stream.enable_buffering(HTML_BUFFER_SIZE)
+
+        if not hasattr(target, 'write'):
+            with open(target, 'w', encoding='utf-8') as f:
+                stream.dump(f)
+        elif isinstance(target, io.TextIOBase):
+            stream.dump(target)
+        else:
+            stream.dump(target, encoding='utf-8')
+
     """
     Generate PDF
     """
 
-    def create_report(self, payload, output='pdf', verbose=False):
+    def _render_document(self, payload, html=None):
+        """Lays out the payload as a WeasyPrint document.
+
+        Args:
+            payload: Extended payload dictionary.
+            html (optional, string): Template already rendered from the payload, without external stylesheets
+                or pipeline images, to lay out instead of rendering it again.
+
+        Returns:
+            Document: Laid out WeasyPrint document.
+        """
+
+        font_config = get_font_config()
+        from weasyprint import HTML
+
+        resources = None
+
+        # Each unique image is downsampled once and served from memory under a fingerprinted URL
+        if self.image_pipeline:
+            with get_phase(self.profiler, 'images'):
+                payload, resources = self.image_pipeline.prepare(payload)
+
+        url_fetcher = get_url_fetcher(resources, allow_network=self.allow_network)
+
+        if html is None or self.cache_stylesheets or self.image_pipeline:
+            with get_phase(self.profiler, 'jinja'):
+                html = self._render_template(payload, external_stylesheets=self.cache_stylesheets)
+
+        with get_phase(self.profiler, 'html_parse'):
+            document = HTML(string=html, base_url=self.base_url, url_fetcher=url_fetcher)
+
+        if self.cache_stylesheets:
+            with get_phase(self.profiler, 'stylesheets'):
+                stylesheets = get_stylesheets(self.base_url, self.allow_network) + [self._get_accent_stylesheet(payload)]
+            with get_phase(self.profiler, 'layout'):
+                return document.render(stylesheets=stylesheets, font_config=font_config)
+
+        with get_phase(self.profiler, 'layout'):
+            return document.render(font_config=font_config)
+
+    def _render_pdfs(self, payloads, workers=None):
+        """Lays out payloads as separate PDFs, in parallel worker processes when workers is set.
+
+        WeasyPrint layout is Python code that holds the GIL, so it only runs in parallel in separate
+        processes. Time spent in the workers is recorded by the profiler as the layout phase.
+
+        Args:
+            payloads: Extended payload dictionaries.
+            workers (optional, int): Number of worker processes.
+
+        Returns:
+            list: PDF bytes of each payload, in order.
+        """
+
+        if not workers or workers < 2 or len(payloads) < 2:
+            return [_render_pdf(self, payload) for payload in payloads]
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Workers only lay out and write PDFs, the output, cache and profiler stay in this process
+        report = copy.copy(self)
+        report.output = None
+        report.cache = None
+        report.profiler = None
+
+        with get_phase(self.profiler, 'layout'):
+            with ProcessPoolExecutor(max_workers=min(workers, len(payloads))) as executor:
+                return list(executor.map(_render_pdf, [report] * len(payloads), payloads))
+
+    def _render_pdf_chunks(self, payload, workers):
+        """Lays out chunks of pages in parallel worker processes as separate PDFs.
+
+        Every page is a self-contained section followed by a page break, so laying out a
+        chunk of pages on its own produces the same pages as a single pass.
+
+        Args:
+            payload: Extended payload dictionary.
+            workers: Number of chunks to lay out in parallel.
+
+        Returns:
+            list: PDF bytes of each chunk, in page order.
+        """
+
+        pages = payload['pages']
+        size, remainder = divmod(len(pages), workers)
+        chunks = []
+        start = 0
+
+        for i in range(workers):
+            end = start + size + (1 if i < remainder else 0)
+            chunks.append({'report': payload['report'], 'pages': pages[start:end]})
+            start = end
+
+        return self._render_pdfs(chunks, workers)
+
+    def _get_pdf_options(self):
+        """Returns the write_pdf options for the report, which subset its fonts unless full_fonts is set.
+
+        Returns:
+            dict: Keyword arguments for write_pdf.
+        """
+
+        return get_pdf_options(get_weasyprint_version(), self.full_fonts)
+
+    def _get_cache_key(self, payload, output):
+        """Returns a stable hash of everything that affects the rendered report.
+
+        The key covers the extended payload, the render options, the template and asset sources,
+        and the bytes of any image files referenced by the pages.
+
+        Args:
+            payload: Extended payload dictionary.
+            output: Output format, pdf or html.
+
+        Returns:
+            string: Hex digest.
+        """
+
+        digest = hashlib.sha256()
+        digest.update(json.dumps(payload, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(self._get_settings_digest(output).encode('ascii'))
+
+        for page in payload['pages']:
+            for image in self._get_image_digests(page):
+                digest.update(image.encode('ascii'))
+
+        return digest.hexdigest() + '.' + output
+
+    def _get_settings_digest(self, output):
+        """Returns a hash of the render options, the template and the asset sources.
+
+        Args:
+            output: Output format, pdf or html.
+
+        Returns:
+            string: Hex digest.
+        """
+
+        digest = hashlib.sha256()
+        digest.update(json.dumps([output, self.template, self.base_url, self.allow_network,
+                                  self.cache_stylesheets, self.image_dpi, self.full_fonts,
+                                  get_weasyprint_version()]).encode('utf-8'))
+
+        assets = os.path.join(os.path.dirname(__file__), 'assets')
+        for root, dirs, files in sorted(os.walk(assets)):
+            for name in sorted(files):
+                digest.update(get_file_digest(os.path.join(root, name)).encode('ascii'))
+
+        return digest.hexdigest()
+
+    def _get_image_digests(self, page):
+        """Returns the digests of the image files referenced by a page.
+
+        Args:
+            page: Page dictionary.
+
+        Returns:
+            list: Hex digests of the visualisation and background files that exist.
+        """
+
+        digests = []
+
+        for image in (page.get('page_visualisation'), page.get('page_background')):
+            if isinstance(image, str):
+                path = image if os.path.isabs(image) else os.path.join(self.base_url, image)
+                if os.path.isfile(path):
+                    digests.append(get_file_digest(path))
+
+        return digests
+
+    def _get_page_fingerprint(self, page, settings):
+        """Returns a hash of everything that affects the layout of one page.
+
+        The fingerprint covers the page's fields, including its table HTML and metrics, the bytes of its
+        images, and the report title, colours and render settings.
+
+        Args:
+            page: Page dictionary of an extended payload.
+            settings: Hash of the report-wide values, see _get_settings_digest.
+
+        Returns:
+            string: Hex digest.
+        """
+
+        def default(value):
+            # In-memory images are identified by their bytes, rather than by encoding them as data URIs
+            if isinstance(value, InlineImage):
+                return 'sha256:' + hashlib.sha256(value.data).hexdigest()
+            return str(value)
+
+        digest = hashlib.sha256(settings.encode('ascii'))
+        digest.update(json.dumps(page, sort_keys=True, default=default).encode('utf-8'))
+
+        for image in self._get_image_digests(page):
+            digest.update(image.encode('ascii'))
+
+        return digest.hexdigest()
+
+    def create_report(self, payload, output='pdf', verbose=False, workers=None, outputs=None,
+                      thumbnail_width=THUMBNAIL_WIDTH, incremental=False):
         """Creates the report.
 
+        The report is written to the Report output, which can be a path, a binary or text file object
+        such as a BytesIO or socket file, or None to return the report as bytes.
+
+        With outputs set, the template is rendered and the document laid out once, and every requested
+        format is written from them. The formats are written next to the output path with their own
+        extensions, i.e. example.pdf, example.html and example-1.png, example-2.png for each page, or
+        returned in a dictionary when the output is None. The render cache is not used in this mode.
+
+        With incremental set, each page of a PDF is kept as a fragment next to the output, with a manifest
+        of page fingerprints, and later renders only lay out the pages whose fingerprint is new before
+        merging the fragments. A first incremental render takes the same path, so the PDF is the same
+        whether pages were reused or not. It is not byte-identical to a full render, as each fragment
+        embeds its own subsets of the fonts, unless full_fonts is set. Requires an output path and pypdf.
+
         Args:
             payload: Dictionary payload.
             output: Output format (optional). pdf or html.
             verbose: Set to true to see dictionary payload.
+            workers (optional, int): Lay out PDF pages in this many chunks in parallel worker processes and merge
+                them. Requires pypdf.
+                With outputs set, the number of processes rasterizing thumbnails instead.
+            outputs (optional, list): Output formats to create from one render: pdf, html and png page thumbnails.
+                PNG thumbnails require pypdfium2 and Pillow.
+            thumbnail_width (optional, int): Width of the PNG thumbnails in pixels.
+            incremental (optional, bool): Only lay out the pages that changed since the last incremental render.
+                Pages are laid out in this many parallel worker processes when workers is set.
 
         Returns:
-            file: Rendered file.
+            bytes: Rendered report when the Report output is None, otherwise None. With outputs set, a
+                dictionary of pdf and html bytes and a list of png bytes, i.e. {'pdf': b'...', 'png': [b'...']}
         """
 
+        if outputs is not None:
+            unsupported = set(outputs) - {'pdf', 'html', 'png'}
+            if unsupported:
+                raise ValueError('Unsupported outputs ' + ', '.join(sorted(unsupported)) + ', use pdf, html or png')
+            if hasattr(self.output, 'write'):
+                raise ValueError('Several outputs need an output path, or None to return them')
+
+        if incremental and (output != 'pdf' or outputs is not None or self.output is None or
+                            hasattr(self.output, 'write')):
+            raise ValueError('Incremental rendering needs a PDF output path')
+
         payload = self._extend_payload(payload)
 
         if verbose:
             print(payload)
 
+        # Lazy tables are formatted up front when profiling, so each page's formatting time is recorded
+        if self.profiler:
+            for index, page in enumerate(payload['pages']):
+                if isinstance(page['page_dataframe'], LazyTable):
+                    with self.profiler.phase('format_dataframe', index):
+                        page['page_dataframe'].render()
+
+        if outputs is not None:
+            return self._create_outputs(payload, outputs, workers, thumbnail_width)
+
+        if incremental:
+            return self._create_incremental(payload, workers)
+
+        # Without an output path or file the rendered report is returned as bytes
+        target = io.BytesIO() if self.output is None else self.output
+        is_path = not hasattr(target, 'write')
+
+        if self.cache:
+            with get_phase(self.profiler, 'cache'):
+                key = self._get_cache_key(payload, output)
+                if self.cache.get(key, target):
+                    return None if self.output is not None else target.getvalue()
+
+        # Renders written to a stream are buffered so they can also be stored in the cache
+        rendered = io.BytesIO() if self.cache and not is_path and self.output is not None else target
+
         if output == 'html':
-            self.to_html(self._render_template(payload), self.output)
+            with get_phase(self.profiler, 'write_html'):
+                self._write_html(payload, rendered)
+        elif workers and workers > 1 and len(payload['pages']) > 1:
+            chunks = self._render_pdf_chunks(payload, min(workers, len(payload['pages'])))
+            with get_phase(self.profiler, 'merge_pdf'):
+                merge_pdfs(chunks, rendered)
         else:
-            return HTML(string=self._render_template(payload),
-                        base_url=self.base_url).write_pdf(self.output)
+            document = self._render_document(payload)
+            with get_phase(self.profiler, 'write_pdf'):
+                document.write_pdf(rendered, **self._get_pdf_options())
+
+        if self.cache:
+            with get_phase(self.profiler, 'cache'):
+                self.cache.put(key, target if is_path else rendered.getvalue())
+            if rendered is not target:
+                write_output(rendered.getvalue(), target)
+
+        if self.output is None:
+            return target.getvalue()
+
+    def _create_outputs(self, payload, outputs, workers=None, thumbnail_width=THUMBNAIL_WIDTH):
+        """Creates several output formats from one template render and one layout.
+
+        Args:
+            payload: Extended payload dictionary.
+            outputs: Output formats: pdf, html and png.
+            workers (optional, int): Number of processes rasterizing thumbnails.
+            thumbnail_width (optional, int): Width of the PNG thumbnails in pixels.
+
+        Returns:
+            dict: Output bytes by format, with a list of page thumbnails for png, when the Report output
+                is None, otherwise None.
+        """
+
+        results = {}
+        html = None
+
+        if 'html' in outputs:
+            with get_phase(self.profiler, 'jinja'):
+                html = self._render_template(payload)
+            results['html'] = html.encode('utf-8')
+
+        if 'pdf' in outputs or 'png' in outputs:
+            document = self._render_document(payload, html)
+            with get_phase(self.profiler, 'write_pdf'):
+                pdf = document.write_pdf(**self._get_pdf_options())
+            if 'pdf' in outputs:
+                results['pdf'] = pdf
+
+        if 'png' in outputs:
+            with get_phase(self.profiler, 'thumbnails'):
+                results['png'] = render_thumbnails(pdf, thumbnail_width, workers)
+
+        if self.output is None:
+            return results
+
+        base = os.path.splitext(self.output)[0]
+        for output in ('pdf', 'html'):
+            if output in results:
+                write_output(results[output], base + '.' + output)
+        for index, image in enumerate(results.get('png', [])):
+            write_output(image, base + '-' + str(index + 1) + '.png')
+
+    def _create_incremental(self, payload, workers=None):
+        """Creates a PDF from page fragments, laying out only the pages without a fragment.
+
+        Args:
+            payload: Extended payload dictionary.
+            workers (optional, int): Number of worker processes laying out changed pages.
+        """
+
+        settings = self._get_settings_digest('pdf')
+        settings = hashlib.sha256((settings + json.dumps(payload['report'], sort_keys=True,
+                                                         default=str)).encode('utf-8')).hexdigest()
+        fingerprints = [self._get_page_fingerprint(page, settings) for page in payload['pages']]
+
+        directory = incremental.get_fragments_dir(self.output)
+        manifest = incremental.load_manifest(self.output) or {'pages': []}
+        previous = set(manifest['pages'])
+
+        # Each changed page is laid out once, even when several pages are identical
+        changed = {}
+        for index, fingerprint in enumerate(fingerprints):
+            if fingerprint not in changed and not (fingerprint in previous and
+                                                   os.path.isfile(os.path.join(directory, fingerprint + '.pdf'))):
+                changed[fingerprint] = index
+
+        # Every fragment is a separate document, so the default stylesheets are parsed once per worker and
+        # shared by its fragments instead of being parsed again for each page
+        report = self
+        if not self.cache_stylesheets and self.template == DEFAULT_TEMPLATE:
+            report = copy.copy(self)
+            report.cache_stylesheets = True
+
+        fragments = report._render_pdfs([{'report': payload['report'], 'pages': [payload['pages'][index]]}
+                                         for index in changed.values()], workers)
+        for fingerprint, data in zip(changed, fragments):
+            incremental.write_fragment(directory, fingerprint, data)
+
+        if self.profiler:
+            for index, fingerprint in enumerate(fingerprints):
+                self.profiler.add_page(index, rendered=changed.get(fingerprint) == index)
+
+        with get_phase(self.profiler, 'merge_pdf'):
+            merge_pdfs([os.path.join(directory, fingerprint + '.pdf') for fingerprint in fingerprints], self.output)
+
+        incremental.save_manifest(self.output, settings, fingerprints, sorted(changed.values()))
+
+    async def create_report_async(self, payload, output='pdf', timeout=None, renderer=None):
+        """Creates the report in an executor without blocking the asyncio event loop.
+
+        Args:
+            payload: Dictionary payload.
+            output: Output format (optional). pdf or html.
+            timeout (optional, float): Seconds to wait for the report before raising asyncio.TimeoutError.
+            renderer (optional, AsyncRenderer): Renderer with its own executor and limits. Defaults to a
+                shared process pool with one render per CPU.
+
+        Returns:
+            bytes: Rendered report, which is also written to the output unless it is None.
+        """
+
+        from gilfoyle.aio import get_renderer
+
+        return await (renderer or get_renderer()).render(self, payload, output, timeout)
 
     """
     Metrics
@@ -262,17 +1040,23 @@ cl
     def to_numeric(string):
         """Strip non-numeric characters and return a float or int depending on decimal.
 
+        A leading minus sign is kept, as in to_numeric_series, which converts series, dataframes and
+        arrays in one vectorized pass.
+
         Args:
-            string (string): Formatted number, i.e. £123,391
+            string (string): Formatted number, i.e. £123,391 or -£5
 
         Return:
             numeric (int/float): Numeric representation of string in int or float.
         """
 
-        if isinstance(string, str):
-            numeric = re.sub("[^0-9.]", "", string)
+        if isinstance(string, (list, tuple)) or is_array(string):
+            numeric = Report.to_numeric_series(string)
 
-            if numeric.isdigit():
+        elif isinstance(string, str):
+            numeric = re.sub("(?<!^)-", "", re.sub("[^0-9.-]", "", string))
+
+            if re.fullmatch("-?[0-9]+", numeric):
                 numeric = int(numeric)
             else:
                 numeric = float(numeric)
@@ -282,6 +1066,58 @@ cl
 
         return numeric
 
+    @staticmethod
+    def to_numeric_series(values):
+        """Strip non-numeric characters from a whole series of formatted numbers in one vectorized pass.
+
+        The result is int64 when every value is a whole number, and float64 otherwise. Leading minus
+        signs are kept, and missing or unparseable values become NaN.
+
+        Args:
+            values (Series/DataFrame/array/list): Formatted numbers, i.e. ['£123,391', '-£1,250.50']
+
+        Return:
+            numeric (Series/DataFrame/array): Numeric representation of the values, of the same type as the input.
+        """
+
+        import numpy as np
+        import pandas as pd
+
+        if isinstance(values, pd.DataFrame):
+            return values.apply(Report.to_numeric_series)
+
+        if not isinstance(values, pd.Series):
+            return Report.to_numeric_series(pd.Series(values, dtype=object)).to_numpy()
+
+        if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+            return values
+
+        if pd.api.types.infer_dtype(values, skipna=False) == 'string' and not values.hasnans:
+            # Only strings: clean them with a single regex and parse them with Pandas, keeping the sign
+            # when the first character of the number is a minus
+            strings = values.astype('str')
+            cleaned = strings.str.replace('[^0-9.]', '', regex=True)
+            numeric = pd.to_numeric(cleaned, errors='coerce').astype(float)
+            numeric = numeric.where(~strings.str.match('[^0-9.-]*-').astype(bool), -numeric)
+
+            if numeric.notna().all() and not cleaned.str.contains('.', regex=False).any():
+                numeric = numeric.astype('int64')
+
+            return numeric
+
+        values = values.astype(object)
+        is_string = values.apply(isinstance, args=(str,)).astype(bool)
+
+        numeric = pd.to_numeric(values.where(~is_string), errors='coerce').astype(float)
+        cleaned = values[is_string].str.replace('[^0-9.-]', '', regex=True).str.replace('(?<!^)-', '', regex=True)
+        numeric[is_string] = pd.to_numeric(cleaned, errors='coerce').astype(float)
+
+        if numeric.notna().all() and (numeric == np.floor(numeric)).all() and \
+                (cleaned.str.fullmatch('-?[0-9]+').all() or cleaned.empty):
+            numeric = numeric.astype('int64')
+
+        return numeric
+
     @staticmethod
     def format_number(metric, prefix=None, suffix=None):
         """Add a prefix or suffix to a number.
@@ -401,3 +1237,80 @@ cl
         }
 
         return metric
+
+    def add_metric_tiles(self,
+                         df,
+                         now_row,
+                         before_row=None,
+                         columns=None,
+                         prefixes=None,
+                         suffixes=None,
+                         metric_name='year',
+                         titles=None):
+        """Create metric tile dictionaries for several dataframe columns at once.
+
+        The numeric coercion, percentage change, change direction and labels are computed for every
+        column in a single vectorized pass, and each tile matches the output of add_metric_tile.
+
+        Args:
+            df: Pandas dataframe containing the metrics.
+            now_row: Index label of the row holding the current period.
+            before_row (optional): Index label of the row holding the comparison period.
+            columns (optional, list): Columns to create tiles for. Defaults to all columns.
+            prefixes (optional, dict): Prefix for each column, i.e. {'Revenue': '£'}
+            suffixes (optional, dict): Suffix for each column, i.e. {'Conversion rate': '%'}
+            metric_name (optional, string, default = year): Optional metric name, i.e. month, week, year
+            titles (optional, dict): Tile title for each column. Defaults to the column name.
+
+        Returns:
+            List of metric tile dictionaries to use as the page metrics.
+
+        Usage:
+            metrics = pdf.add_metric_tiles(df,
+                                           now_row=0,
+                                           before_row=12,
+                                           columns=['Sessions', 'Conversion rate', 'Revenue'],
+                                           prefixes={'Revenue': '£'},
+                                           suffixes={'Conversion rate': '%'})
+        """
+
+        import numpy as np
+
+        columns = list(df.columns) if columns is None else list(columns)
+        prefixes = prefixes or {}
+        suffixes = suffixes or {}
+        titles = titles or {}
+
+        # Read each row as one series, which is far cheaper than selecting the cells column by column, and
+        # remove any formatting from both rows in a single pass
+        rows = [now_row] if before_row is None else [now_row, before_row]
+        raw = np.array([df.loc[row][columns].to_numpy(dtype=object) for row in rows])
+        values = self.to_numeric_series(raw.ravel()).astype(float).reshape(raw.shape)
+
+        # Show each value as add_metric_tile would: strings as ints unless they have decimals, and integer
+        # columns as ints even when the row was read as floats
+        integer = [dtype.kind in 'iu' for dtype in df.dtypes[columns]]
+        values_now = [int(number) if is_integer and isinstance(value, float) and number.is_integer() else
+                      value if not isinstance(value, str) else
+                      int(number) if number.is_integer() and '.' not in value else number
+                      for value, number, is_integer in zip(raw[0].tolist(), values[0].tolist(), integer)]
+        labels = [''] * len(columns)
+
+        # Get percentage change, change direction and labels
+        if before_row is not None:
+            now, before = values
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                percentage_change = np.where(now == before, 0.0, np.abs(now - before) / before * 100.0)
+
+            directions = np.select([now > before, now < before, now == before], ['Up', 'Down', 'Flat'], '')
+            has_label = (before != 0) & np.isfinite(before) & np.isfinite(percentage_change)
+            changes = np.round(np.where(has_label, percentage_change, 0)).astype('int64')
+
+            labels = [direction + ' ' + str(change) + '% on last ' + metric_name if label else ''
+                      for direction, change, label in zip(directions.tolist(), changes.tolist(), has_label.tolist())]
+
+        return [{'metric_title': titles.get(column, column),
+                 'metric_value': self.format_number(value, prefixes.get(column), suffixes.get(column)),
+                 'metric_label': label}
+                for column, value, label in zip(columns, values_now, labels)]
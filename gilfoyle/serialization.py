@@ -0,0 +1,260 @@
+"""
+Payload serialization
+
+A compact binary format for sending payloads between the services that build them and the services that
+render them. Pages are stored as fixed-shape records rather than dictionaries, tables stay as dataframes
+whose column buffers are written out-of-band (pickle protocol 5), and images are stored once, referenced by
+the SHA-256 of their bytes. Loading maps the table buffers straight out of the message, without copying them.
+
+Message layout, all integers unsigned big-endian:
+
+    magic b'GILFOYLE', version (16 bits), number of buffers (32 bits)
+    pickle length (64 bits), then the length of each buffer (64 bits each)
+    pickle, then each buffer, every buffer starting on a 64-byte boundary
+"""
+
+import base64
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+from gilfoyle.images import InlineImage
+from gilfoyle.tables import LazyTable
+
+MAGIC = b'GILFOYLE'
+VERSION = 1
+HEADER = struct.Struct('>8sHI')
+LENGTH = struct.Struct('>Q')
+
+# Buffers are aligned so NumPy arrays loaded from them are aligned too
+ALIGNMENT = 64
+
+# Keys of a page dictionary, in the order they are stored in a PageRecord
+PAGE_FIELDS = ('page_type',
+               'page_layout',
+               'page_title',
+               'page_subheading',
+               'page_commentary',
+               'page_message',
+               'page_notification',
+               'page_metrics',
+               'page_dataframe',
+               'page_visualisation',
+               'page_background')
+
+IMAGE_FIELDS = ('page_visualisation', 'page_background')
+
+
+class ImageRef:
+    """Reference to an image stored once in a serialized payload.
+
+    Args:
+        digest: SHA-256 hex digest of the image bytes.
+        inline (optional, bool): The page held an InlineImage, rather than a data URI string.
+    """
+
+    __slots__ = ('digest', 'inline')
+
+    def __init__(self, digest, inline=True):
+        self.digest = digest
+        self.inline = inline
+
+    def __reduce__(self):
+        return ImageRef, (self.digest, self.inline)
+
+    def __repr__(self):
+        return '<ImageRef ' + self.digest[:12] + '>'
+
+
+class PageRecord:
+    """A page of a payload stored as one slot per page field instead of a dictionary.
+
+    Args:
+        values: Values of the page fields, in the order of PAGE_FIELDS.
+    """
+
+    __slots__ = PAGE_FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(PAGE_FIELDS, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def from_dict(cls, page, images):
+        """Create a record from a page dictionary, moving its images into a shared image table.
+
+        Args:
+            page: Page dictionary, as added by Report.add_page.
+            images: Dictionary of image digests to (MIME type, bytes), updated with the page's images.
+
+        Returns:
+            PageRecord: Page record.
+        """
+
+        values = []
+
+        for field in PAGE_FIELDS:
+            value = page.get(field)
+
+            if field in IMAGE_FIELDS:
+                value = _to_image_ref(value, images)
+            elif isinstance(value, LazyTable) and value.dataframe is not None:
+                # Tables are sent as dataframes, and converted to HTML by the renderer
+                value = LazyTable(value.dataframe, value.formatter, value.drop_source)
+
+            values.append(value)
+
+        return cls(*values)
+
+    def to_dict(self, images):
+        """Return the page dictionary of the record.
+
+        Args:
+            images: Dictionary of image digests to (MIME type, bytes).
+
+        Returns:
+            dict: Page dictionary, as added by Report.add_page.
+        """
+
+        page = {}
+
+        for field in PAGE_FIELDS:
+            value = getattr(self, field)
+            if isinstance(value, ImageRef):
+                mime_type, data = images[value.digest]
+                image = InlineImage(data, mime_type)
+                value = image if value.inline else image.to_uri()
+            page[field] = value
+
+        return page
+
+    def __reduce__(self):
+        # Values are stored positionally, so field names are not repeated for every page
+        return PageRecord, tuple(getattr(self, field) for field in PAGE_FIELDS)
+
+    def __repr__(self):
+        return '<PageRecord ' + repr(self.page_type) + ' ' + repr(self.page_title) + '>'
+
+
+def _to_image_ref(image, images):
+    """Return a reference to an in-memory image or data URI, adding it to the image table."""
+
+    if isinstance(image, InlineImage):
+        data, mime_type, inline = image.data, image.mime_type, True
+    elif isinstance(image, str) and image.startswith('data:') and ';base64,' in image:
+        header, encoded = image.split(',', 1)
+        data, mime_type, inline = base64.b64decode(encoded), header[5:-7], False
+    else:
+        # File paths and URLs are kept as they are
+        return image
+
+    digest = hashlib.sha256(data).hexdigest()
+    images.setdefault(digest, (mime_type, data))
+    return ImageRef(digest, inline)
+
+
+def dumps(payload):
+    """Serialize a payload to bytes.
+
+    Build the payload with Report(lazy_tables=True) to send its tables as dataframes rather than HTML.
+
+    Args:
+        payload: Dictionary payload.
+
+    Returns:
+        bytes: Serialized payload.
+    """
+
+    images = {}
+    pages = [PageRecord.from_dict(page, images) for page in payload['pages']]
+    message = {'report': payload['report'],
+               'pages': pages,
+               'images': {digest: (mime_type, pickle.PickleBuffer(data))
+                          for digest, (mime_type, data) in images.items()}}
+
+    buffers = []
+    body = pickle.dumps(message, protocol=5, buffer_callback=buffers.append)
+    buffers = [buffer.raw() for buffer in buffers]
+
+    parts = [HEADER.pack(MAGIC, VERSION, len(buffers)), LENGTH.pack(len(body))]
+    parts.extend(LENGTH.pack(buffer.nbytes) for buffer in buffers)
+    parts.append(body)
+
+    offset = sum(len(part) for part in parts)
+    for buffer in buffers:
+        padding = -offset % ALIGNMENT
+        parts.append(b'\0' * padding)
+        parts.append(buffer)
+        offset += padding + buffer.nbytes
+
+    return b''.join(parts)
+
+
+def loads(data):
+    """Deserialize a payload, without copying the table buffers.
+
+    The dataframes of the payload are backed by data, so they are read-only when data is bytes, and data
+    is kept alive for as long as they are.
+
+    Args:
+        data: Serialized payload, as bytes, a memoryview, or an mmap.
+
+    Returns:
+        dict: Dictionary payload, with the same shape as the one serialized.
+    """
+
+    view = memoryview(data)
+    magic, version, count = HEADER.unpack_from(view)
+
+    if magic != MAGIC:
+        raise ValueError('Not a serialized Gilfoyle payload')
+    if version != VERSION:
+        raise ValueError('Unsupported payload version ' + str(version) + ', expected ' + str(VERSION))
+
+    offset = HEADER.size
+    lengths = [LENGTH.unpack_from(view, offset + i * LENGTH.size)[0] for i in range(count + 1)]
+    offset += len(lengths) * LENGTH.size
+
+    body = view[offset:offset + lengths[0]]
+    offset += lengths[0]
+
+    buffers = []
+    for length in lengths[1:]:
+        offset += -offset % ALIGNMENT
+        buffers.append(view[offset:offset + length])
+        offset += length
+
+    message = pickle.loads(body, buffers=buffers)
+    images = message['images']
+
+    return {'report': message['report'],
+            'pages': [record.to_dict(images) for record in message['pages']]}
+
+
+def dump(payload, path):
+    """Serialize a payload to a file.
+
+    Args:
+        payload: Dictionary payload.
+        path: File path.
+    """
+
+    with open(path, 'wb') as f:
+        f.write(dumps(payload))
+
+
+def load(path):
+    """Deserialize a payload from a file, memory-mapping it so table buffers are read from the page cache.
+
+    Args:
+        path: File path.
+
+    Returns:
+        dict: Dictionary payload.
+    """
+
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError('Not a serialized Gilfoyle payload')
+        return loads(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
@@ -0,0 +1,313 @@
+"""
+Data sources
+
+Lazy CSV and Parquet sources for page tables. A source names the columns, row filters and number of rows a
+page shows, and is read only when the page is added, reading no more of the file than that: CSV files are
+read in chunks that stop once enough rows match, and Parquet files are memory-mapped with the columns and
+filters pushed down to the reader. Sources that set no columns or limit only read the columns and the first
+and last rows the page table shows. Identical sources are read once per Report.
+"""
+
+import operator
+import os
+import threading
+
+# Rows read at a time from CSV files when filtering
+CHUNK_ROWS = 50000
+
+FILTER_OPERATORS = {
+    '==': operator.eq,
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda series, value: series.isin(value),
+    'not in': lambda series, value: ~series.isin(value),
+}
+
+
+class DataSource:
+    """A CSV or Parquet file to read into a page table when the page is added.
+
+    Args:
+        path: Path or URL of the file.
+        columns (optional, list): Columns to read. Defaults to every column.
+        filters (optional, list): Row filters as (column, operator, value) tuples, all of which must match,
+            i.e. [('Sessions', '>', 1000)]. Operators are ==, !=, <, <=, >, >=, in and not in.
+        limit (optional, int): Maximum number of rows to read, after filtering.
+        format (optional, string): csv or parquet. Detected from the file extension by default.
+        read_options (optional, dict): Extra keyword arguments for pandas.read_csv, or for Parquet files
+            pyarrow.parquet.read_table (pandas.read_parquet without PyArrow), i.e. {'skiprows': 1}
+        tail (optional, int): Number of last rows to read as well as the first limit rows, skipping the rows
+            in between. Finding the last rows of a CSV file, or of filtered rows, reads through the whole file.
+
+    Usage:
+        source = DataSource('sales.parquet', columns=['Period', 'Revenue'], filters=[('Region', '==', 'UK')], limit=13)
+        payload = pdf.add_page(payload, page_type='report', page_layout='simple', page_title='UK', page_dataframe=source)
+    """
+
+    __slots__ = ('path', 'columns', 'filters', 'limit', 'format', 'read_options', 'tail')
+
+    def __init__(self, path, columns=None, filters=None, limit=None, format=None, read_options=None, tail=None):
+        self.path = os.fspath(path)
+        self.columns = list(columns) if columns is not None else None
+        self.filters = [tuple(condition) for condition in filters or []]
+        self.limit = limit
+        self.format = format or ('parquet' if self.path.lower().endswith(('.parquet', '.pq')) else 'csv')
+        self.read_options = dict(read_options or {})
+        self.tail = tail if limit is not None else None
+
+        if self.format not in ('csv', 'parquet'):
+            raise ValueError('Unsupported format ' + repr(self.format) + ', use csv or parquet')
+
+        for column, op, value in self.filters:
+            if op not in FILTER_OPERATORS:
+                raise ValueError('Unsupported filter operator ' + repr(op) + ' on column ' + repr(column))
+
+    @property
+    def key(self):
+        """String identifying the data read by the source, used to read identical sources once."""
+
+        return repr((self.path, self.format, self.columns, self.filters, self.limit,
+                     sorted(self.read_options.items()), self.tail))
+
+    def _is_local(self):
+        return os.path.isfile(self.path)
+
+    def _read_column_names(self):
+        """Return the column names of the file from its CSV header or Parquet schema, without reading any rows."""
+
+        if self.format == 'csv':
+            import pandas as pd
+
+            return list(pd.read_csv(self.path, nrows=0, **self.read_options).columns)
+
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            return None
+
+        return pq.read_schema(self.path, memory_map=self._is_local()).names
+
+    def for_page(self, max_rows=None, max_cols=None):
+        """Return a source reading no more rows or columns than a page table shows, where this source sets none.
+
+        Without columns, a file with more than max_cols columns is read as the first and last halves of
+        max_cols, with one column in between, and without a limit only the first and last halves of max_rows
+        rows are read, with one row in between, so the table is truncated as it would be for the whole file.
+
+        Args:
+            max_rows (optional, int): Maximum number of rows a page shows, or None for every row.
+            max_cols (optional, int): Maximum number of columns a page shows, or None for every column.
+
+        Returns:
+            DataSource: This source, or a copy limited to the rows and columns shown.
+        """
+
+        columns = self.columns
+        limit = self.limit
+        tail = self.tail
+
+        if limit is None and max_rows and 'nrows' not in self.read_options:
+            tail = max_rows // 2
+            limit = max_rows + 1 - tail
+
+        if columns is None and max_cols and not {'usecols', 'columns'} & set(self.read_options):
+            names = self._read_column_names()
+            if names is not None and len(names) > max_cols + 1:
+                half = max_cols // 2
+                columns = names[:half] + [names[half]] + names[-half:]
+
+        if columns is self.columns and limit == self.limit:
+            return self
+
+        return DataSource(self.path, columns, self.filters, limit, self.format, self.read_options, tail)
+
+    def _get_read_columns(self):
+        """Columns to read, including those only needed to filter the rows."""
+
+        if self.columns is None:
+            return None
+        return self.columns + [column for column, op, value in self.filters if column not in self.columns]
+
+    def _filter(self, dataframe):
+        if not self.filters:
+            return dataframe
+
+        mask = None
+        for column, op, value in self.filters:
+            condition = FILTER_OPERATORS[op](dataframe[column], value)
+            mask = condition if mask is None else mask & condition
+
+        return dataframe[mask]
+
+    def _read_csv(self):
+        import pandas as pd
+
+        options = dict(self.read_options)
+        if self.columns is not None:
+            options['usecols'] = self._get_read_columns()
+        if self._is_local():
+            options.setdefault('memory_map', True)
+
+        if not self.filters and not self.tail:
+            return pd.read_csv(self.path, nrows=self.limit, **options)
+
+        # Chunks are read until enough rows match the filters, so the rest of the file is never parsed.
+        # The last rows are only found at the end of the file, keeping no more chunks than they need.
+        chunks = []
+        last = None
+        rows = 0
+        with pd.read_csv(self.path, chunksize=CHUNK_ROWS, **options) as reader:
+            for chunk in reader:
+                chunk = self._filter(chunk)
+                if self.limit is None or rows < self.limit:
+                    chunks.append(chunk)
+                    rows += len(chunk)
+                elif last is None:
+                    last = chunk.tail(self.tail)
+                else:
+                    last = pd.concat([last, chunk]).tail(self.tail)
+                if self.limit is not None and rows >= self.limit and not self.tail:
+                    break
+
+        if last is not None:
+            chunks.append(last)
+
+        return pd.concat(chunks, ignore_index=True)
+
+    def _read_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            import pandas as pd
+
+            return self._filter(pd.read_parquet(self.path, columns=self._get_read_columns(), **self.read_options))
+
+        filters = [(column, '==' if op == '=' else op, value) for column, op, value in self.filters]
+
+        if filters or self.limit is None or self.read_options:
+            # Row groups whose statistics rule out the filters are skipped without being read
+            table = pq.read_table(self.path, columns=self._get_read_columns(), filters=filters or None,
+                                  memory_map=self._is_local(), **self.read_options)
+            return table.to_pandas()
+
+        # Only the first batches of the file are decoded, and the last row groups for the last rows
+        parquet_file = pq.ParquetFile(self.path, memory_map=self._is_local())
+
+        if self.tail and parquet_file.metadata.num_rows > self.limit + self.tail:
+            import pandas as pd
+
+            return pd.concat([self._read_parquet_head(parquet_file, self.limit),
+                              self._read_parquet_tail(parquet_file)], ignore_index=True)
+
+        return self._read_parquet_head(parquet_file, self.limit + (self.tail or 0))
+
+    def _read_parquet_head(self, parquet_file, limit):
+        import pyarrow as pa
+
+        batches = []
+        rows = 0
+        for batch in parquet_file.iter_batches(batch_size=min(limit, CHUNK_ROWS), columns=self._get_read_columns()):
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= limit:
+                break
+
+        table = pa.Table.from_batches(batches) if batches else parquet_file.schema_arrow.empty_table()
+        return table.to_pandas()
+
+    def _read_parquet_tail(self, parquet_file):
+        metadata = parquet_file.metadata
+        groups = []
+        rows = 0
+        for group in reversed(range(metadata.num_row_groups)):
+            groups.insert(0, group)
+            rows += metadata.row_group(group).num_rows
+            if rows >= self.tail:
+                break
+
+        table = parquet_file.read_row_groups(groups, columns=self._get_read_columns())
+        return table.slice(table.num_rows - self.tail).to_pandas()
+
+    def read(self):
+        """Read the rows and columns of the source.
+
+        Returns:
+            DataFrame: Pandas dataframe with at most limit + tail rows, holding the requested columns in their order.
+        """
+
+        dataframe = self._read_csv() if self.format == 'csv' else self._read_parquet()
+
+        if self.columns is not None:
+            dataframe = dataframe[self.columns]
+        if self.tail:
+            if len(dataframe) > self.limit + self.tail:
+                import pandas as pd
+
+                dataframe = pd.concat([dataframe.iloc[:self.limit], dataframe.iloc[-self.tail:]])
+        elif self.limit is not None:
+            dataframe = dataframe.head(self.limit)
+
+        return dataframe.reset_index(drop=True) if self.filters or self.tail else dataframe
+
+    def __repr__(self):
+        return '<DataSource ' + self.format + ' ' + self.path + '>'
+
+
+class SourceCache:
+    """Dataframes read from data sources, so identical sources are read once while a report is built.
+
+    The cache is emptied when the report is copied to another process.
+    """
+
+    def __init__(self):
+        self._dataframes = {}
+        self._lock = threading.Lock()
+
+    def read(self, source, max_rows=None, max_cols=None):
+        """Return the dataframe of a source, reading it on first use.
+
+        Args:
+            source: DataSource.
+            max_rows (optional, int): Maximum number of rows a page shows, read as DataSource.for_page does.
+            max_cols (optional, int): Maximum number of columns a page shows, read as DataSource.for_page does.
+
+        Returns:
+            DataFrame: Pandas dataframe. The same dataframe is returned for identical sources, so avoid
+                modifying it in place.
+        """
+
+        if max_rows or max_cols:
+            # Pages are looked up before the header of the file is read to pick the columns they show
+            return self._get(repr((source.key, max_rows, max_cols)),
+                             lambda: self.read(source.for_page(max_rows, max_cols)))
+
+        return self._get(source.key, source.read)
+
+    def _get(self, key, read):
+        dataframe = self._dataframes.get(key)
+
+        if dataframe is None:
+            dataframe = read()
+            with self._lock:
+                dataframe = self._dataframes.setdefault(key, dataframe)
+
+        return dataframe
+
+    def clear(self):
+        """Release every dataframe read."""
+
+        with self._lock:
+            self._dataframes.clear()
+
+    def __len__(self):
+        return len(self._dataframes)
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
@@ -0,0 +1,156 @@
+"""
+Streaming reports
+
+Renders a report page by page as pages are added, so the full payload never has to be held in memory.
+"""
+
+import io
+import tempfile
+
+from gilfoyle.pdf import merge_pdfs
+from gilfoyle.profiling import get_phase
+
+
+class ReportStream:
+    """Context manager that renders each page of a report as soon as it is added.
+
+    HTML output is written to the report output as each page is added, using Jinja's generate().
+    PDF output lays out pages in groups of chunk_size as they are added and writes each group to a
+    temporary PDF, which are merged into the report when the stream is closed. Merging requires pypdf.
+    The report output can be a path, a file object, or None to keep the finished report as bytes in result.
+
+    Args:
+        report: Configured Report.
+        output (optional, string): Output format, pdf or html.
+        chunk_size (optional, int): Number of pages to lay out together when writing a PDF.
+
+    Usage:
+        with pdf.stream(output='html') as stream:
+            for category, df in categories:
+                stream.add_page(page_type='report',
+                                page_layout='simple',
+                                page_title=category,
+                                page_dataframe=df)
+    """
+
+    HEAD_TEMPLATE = 'assets/templates/head.tmpl'
+    PAGE_TEMPLATE = 'assets/templates/page.tmpl'
+    FOOT_TEMPLATE = 'assets/templates/foot.tmpl'
+
+    def __init__(self, report, output='pdf', chunk_size=50):
+        self.report = report
+        self.output = output
+        self.chunk_size = chunk_size
+        self.payload = None
+        self.page_count = 0
+        self.result = None
+        self._file = None
+        self._owns_file = False
+        self._pages = []
+        self._fragments = []
+
+    def __enter__(self):
+        self.payload = self.report._extend_payload(self.report.get_payload())
+
+        if self.output == 'html':
+            target = self.report.output
+            if target is None:
+                self._file = io.StringIO()
+            elif hasattr(target, 'write'):
+                self._file = target
+            else:
+                self._file = open(target, 'w', encoding='utf-8')
+                self._owns_file = True
+            self._write(self.HEAD_TEMPLATE)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.close()
+        finally:
+            if self._owns_file:
+                self._file.close()
+            self._file = None
+            for fragment in self._fragments:
+                fragment.close()
+            self._fragments = []
+
+    def _write(self, template, **context):
+        """Render a template in chunks straight to the HTML output.
+
+        Args:
+            template: Template path.
+            context: Additional template variables, i.e. page
+        """
+
+        template = self.report._get_template(template)
+        binary = not isinstance(self._file, io.TextIOBase)
+        for chunk in template.generate(self.payload, **context):
+            self._file.write(chunk.encode('utf-8') if binary else chunk)
+
+    def _flush(self):
+        """Lay out the buffered pages and write them to a temporary PDF, releasing the layout."""
+
+        if self._pages or not self._fragments:
+            data = self.report._render_pdfs([{'report': self.payload['report'], 'pages': self._pages}])[0]
+            fragment = tempfile.TemporaryFile(prefix='gilfoyle-', suffix='.pdf')
+            fragment.write(data)
+            fragment.seek(0)
+            self._fragments.append(fragment)
+            self._pages = []
+
+    def add_page(self, page_type, page_title, **kwargs):
+        """Add a new page to the report and render it.
+
+        Args:
+            page_type: Page type, i.e. cover, chapter, report
+            page_title: Page title
+            kwargs: Any other argument accepted by Report.add_page, i.e. page_dataframe
+
+        Returns:
+            int: Number of pages added so far.
+        """
+
+        # Pages are numbered from the pages already streamed, so the profiler records each under its own index
+        pages = self.report._create_pages(self.page_count, page_type, page_title, **kwargs)
+        self.page_count += len(pages)
+
+        if self.output == 'html':
+            for page in pages:
+                self._write(self.PAGE_TEMPLATE, page=page)
+        else:
+            self._pages.extend(pages)
+            if len(self._pages) >= self.chunk_size:
+                self._flush()
+
+        return self.page_count
+
+    def close(self):
+        """Finish the report, writing the closing HTML or the merged PDF.
+
+        Returns:
+            bytes: Rendered report when the report output is None, otherwise None.
+        """
+
+        if self.output == 'html':
+            if self._file is not None:
+                self._write(self.FOOT_TEMPLATE)
+                if self.report.output is None:
+                    self.result = self._file.getvalue().encode('utf-8')
+            return self.result
+
+        self._flush()
+
+        target = io.BytesIO() if self.report.output is None else self.report.output
+        with get_phase(self.report.profiler, 'merge_pdf'):
+            merge_pdfs(self._fragments, target)
+
+        for fragment in self._fragments:
+            fragment.close()
+        self._fragments = []
+
+        if self.report.output is None:
+            self.result = target.getvalue()
+        return self.result
@@ -0,0 +1,391 @@
+"""
+Tables
+
+Helpers for turning Pandas dataframes into the HTML tables shown on report pages.
+"""
+
+import sys
+
+
+TABLE_CLASSES = ['dataframe', 'table', 'is-striped', 'is-fullwidth']
+
+
+def is_dataframe(value):
+    """Return True if the value is a Pandas dataframe, without importing Pandas.
+
+    Args:
+        value: Any value.
+
+    Returns:
+        bool: True for a dataframe.
+    """
+
+    pandas = sys.modules.get('pandas')
+    return pandas is not None and isinstance(value, pandas.DataFrame)
+
+
+class LazyTable:
+    """A dataframe held in the payload and only converted to HTML when the template renders it.
+
+    Args:
+        dataframe: Pandas dataframe.
+        formatter: Function returning the HTML of a dataframe, i.e. Report.format_dataframe
+        drop_source (optional, bool): Release the dataframe once its HTML has been generated.
+    """
+
+    __slots__ = ('dataframe', 'formatter', 'drop_source', 'shape', '_html')
+
+    def __init__(self, dataframe, formatter, drop_source=False):
+        self.dataframe = dataframe
+        self.formatter = formatter
+        self.drop_source = drop_source
+        self.shape = dataframe.shape
+        self._html = None
+
+    def render(self):
+        """Return the HTML of the table, converting the dataframe on first use.
+
+        Returns:
+            string: Dataframe in HTML format.
+        """
+
+        if self._html is None:
+            self._html = self.formatter(self.dataframe)
+            if self.drop_source:
+                self.dataframe = None
+
+        return self._html
+
+    def __html__(self):
+        return self.render()
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return '<LazyTable ' + str(self.shape[0]) + ' rows x ' + str(self.shape[1]) + ' columns>'
+
+
+class TablePages:
+    """The pages of a table split into pages of rows, which are all formatted the first time one is rendered.
+
+    Formatting every page in one pass is faster than formatting each page on its own, and floats have
+    the same decimal places on every page, as they do with render_table_pages.
+
+    Args:
+        dataframes: Pandas dataframes holding the rows of each page, all but the last of the same length.
+        max_cols (optional, int): Maximum number of columns to show, or None for all columns.
+    """
+
+    __slots__ = ('dataframes', 'max_cols', '_tables')
+
+    def __init__(self, dataframes, max_cols=10):
+        self.dataframes = dataframes
+        self.max_cols = max_cols
+        self._tables = None
+
+    def format(self, index, dataframe=None):
+        """Return the HTML of a page's table, formatting every page on first use and then releasing the rows.
+
+        Args:
+            index: Position of the page in the table.
+            dataframe (optional): Rows of the page, passed when used as a LazyTable formatter. The rows
+                held by the pages are used instead.
+
+        Returns:
+            string: Page's table in HTML format.
+        """
+
+        if self._tables is None:
+            import pandas as pd
+
+            dataframe = pd.concat(self.dataframes)
+            self._tables = render_table_pages(dataframe, len(self.dataframes[0]), self.max_cols)
+            self.dataframes = None
+
+        return self._tables[index]
+
+    def __repr__(self):
+        return '<TablePages ' + str(len(self._tables if self.dataframes is None else self.dataframes)) + ' pages>'
+
+
+def _truncate(dataframe, max_rows, max_cols):
+    """Return the row and column positions of a dataframe that fit in the table, before any formatting.
+
+    Like DataFrame.to_html, a truncated table shows the first and last halves of its rows and columns.
+
+    Args:
+        dataframe: Pandas dataframe.
+        max_rows: Maximum number of rows to show, or None for all rows.
+        max_cols: Maximum number of columns to show, or None for all columns.
+
+    Returns:
+        tuple: Truncated dataframe, position of the truncated row, position of the truncated column.
+    """
+
+    import numpy as np
+
+    n_rows, n_cols = dataframe.shape
+    rows = slice(None)
+    cols = slice(None)
+    row_break = col_break = None
+
+    if max_rows and n_rows > max_rows:
+        row_break = max_rows // 2
+        rows = np.r_[0:row_break, n_rows - row_break:n_rows]
+
+    if max_cols and n_cols > max_cols:
+        col_break = max_cols // 2
+        cols = np.r_[0:col_break, n_cols - col_break:n_cols]
+
+    # A single take, so only the visible cells are ever copied or formatted
+    if row_break is not None or col_break is not None:
+        dataframe = dataframe.iloc[rows, cols]
+
+    return dataframe, row_break, col_break
+
+
+def trim(dataframe, max_rows, max_cols):
+    """Return a copy of only the rows and columns of a dataframe that its table shows.
+
+    A truncated table shows the first and last halves of its rows and columns, so those are kept
+    along with enough of the hidden ones for the copy to be truncated in exactly the same way. The
+    copy shares no memory with the dataframe, which can be released.
+
+    Args:
+        dataframe: Pandas dataframe.
+        max_rows: Maximum number of rows to show, or None for all rows.
+        max_cols: Maximum number of columns to show, or None for all columns.
+
+    Returns:
+        DataFrame: Pandas dataframe with at most max_rows + 1 rows and max_cols + 1 columns.
+    """
+
+    import numpy as np
+
+    n_rows, n_cols = dataframe.shape
+    rows = slice(None)
+    cols = slice(None)
+
+    if max_rows and n_rows > max_rows + 1:
+        half = max_rows // 2
+        rows = np.r_[0:max_rows + 1 - half, n_rows - half:n_rows]
+
+    if max_cols and n_cols > max_cols + 1:
+        half = max_cols // 2
+        cols = np.r_[0:max_cols + 1 - half, n_cols - half:n_cols]
+
+    return dataframe.iloc[rows, cols].copy()
+
+
+def _escape(strings):
+    """HTML escape a NumPy array of strings, stripping surrounding whitespace as DataFrame.to_html does."""
+
+    import numpy as np
+
+    return np.array([string.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').strip()
+                     for string in strings], dtype=object)
+
+
+def _format_with_pandas(values):
+    """Format column values with the formatter DataFrame.to_html uses, for the values the fast paths do not cover.
+
+    Args:
+        values: NumPy or Pandas extension array of column values.
+
+    Returns:
+        numpy.ndarray: Formatted cell values.
+    """
+
+    import pandas as pd
+    from pandas.io.formats.format import format_array
+
+    if values.dtype.kind in 'mM':
+        # The datetime formatters need the Pandas array, not the NumPy one
+        values = pd.array(values)
+    return _escape(format_array(values, None, leading_space=False))
+
+
+def _format_float(values, precision):
+    """Format floats as DataFrame.to_html does: in fixed-point notation with precision decimals, less the
+    trailing zeros every number shares, or in scientific notation when small values would show as zero
+    or large ones make the fixed-point numbers too long.
+
+    Args:
+        values: NumPy array of floats.
+        precision: Number of decimals, the display.precision option of Pandas.
+
+    Returns:
+        numpy.ndarray: Formatted cell values.
+    """
+
+    import numpy as np
+
+    finite = np.isfinite(values)
+    decimals = precision
+
+    if precision and finite.any():
+        strings = np.char.mod('%.' + str(precision) + 'f', values[finite])
+        zeros = np.char.str_len(strings) - np.char.str_len(np.char.rstrip(strings, '0'))
+        decimals = max(precision - int(zeros.min()), 1)
+
+    strings = np.char.mod('%.' + str(decimals) + 'f', values)
+    magnitudes = np.abs(values[~np.isnan(values)])
+    too_long = len(values) and np.char.str_len(strings).max() > precision + 6
+
+    if ((magnitudes > 0) & (magnitudes < 10.0 ** -precision)).any() or (too_long and (magnitudes > 1e6).any()):
+        strings = np.char.mod('%.' + str(precision) + 'e', values)
+
+    strings = strings.astype(object)
+    strings[np.isnan(values)] = 'NaN'
+    return strings
+
+
+def _format_column(values):
+    """Format the values of a dataframe column as HTML-safe strings in one vectorized pass.
+
+    The cells match DataFrame.to_html. Floats, integers, booleans, second-resolution datetimes and
+    strings are formatted by NumPy; other values, such as timedeltas and extension arrays with their
+    own missing value, use the Pandas formatter itself.
+
+    Args:
+        values: NumPy or Pandas extension array of column values.
+
+    Returns:
+        numpy.ndarray: Formatted cell values.
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    if not isinstance(values, np.ndarray):
+        return _format_with_pandas(values)
+
+    kind = values.dtype.kind
+
+    if kind == 'f':
+        return _format_float(values, pd.get_option('display.precision'))
+
+    if kind in 'iub':
+        return values.astype(str).astype(object)
+
+    if kind == 'M':
+        missing = np.isnat(values)
+        present = values[~missing]
+        if not (present == present.astype('datetime64[s]')).all():
+            return _format_with_pandas(values)
+        unit = 'D' if (present == present.astype('datetime64[D]')).all() else 's'
+        strings = np.char.replace(np.datetime_as_string(values, unit=unit), 'T', ' ').astype(object)
+        strings[missing] = 'NaT'
+        return strings
+
+    if kind == 'O' and pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        strings = _escape(values.astype(str))
+        strings[pd.isna(values) & (strings == 'nan')] = 'NaN'
+        return strings
+
+    return _format_with_pandas(values)
+
+
+def _get_values(column):
+    """Return the values of a column as a NumPy array, or its extension array when NumPy cannot hold them."""
+
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(column.dtype, np.dtype):
+        return column.to_numpy()
+    if isinstance(column.dtype, pd.StringDtype):
+        # Strings are formatted by the fast path, and keep their own missing value
+        return column.to_numpy(dtype=object)
+    return column.array
+
+
+def _format_table(dataframe, col_break):
+    """Return the escaped headers and formatted columns of a truncated dataframe.
+
+    Args:
+        dataframe: Truncated Pandas dataframe.
+        col_break: Position of the truncated column, or None.
+
+    Returns:
+        tuple: List of headers, and a list of NumPy arrays of formatted cells, one per column.
+    """
+
+    import numpy as np
+
+    headers = list(_escape(str(name) for name in dataframe.columns))
+    columns = [_format_column(_get_values(column)) for name, column in dataframe.items()]
+
+    if col_break is not None:
+        headers.insert(col_break, '...')
+        columns.insert(col_break, np.full(len(dataframe), '...', dtype=object))
+
+    return headers, columns
+
+
+def _table_html(headers, rows, classes=None):
+    """Return the HTML of a table from its headers and rows of formatted cells."""
+
+    html = ['<table class="' + ' '.join(classes or TABLE_CLASSES) + '"><thead><tr>']
+    html += ['<th>' + header + '</th>' for header in headers]
+    html.append('</tr></thead><tbody>')
+    html += ['<tr><td>' + '</td><td>'.join(row) + '</td></tr>' for row in rows]
+    html.append('</tbody></table>')
+
+    return ''.join(html)
+
+
+def render_table(dataframe, max_rows=13, max_cols=10, classes=None):
+    """Returns the HTML of a dataframe using a lightweight renderer in place of DataFrame.to_html.
+
+    Rows and columns are truncated before any formatting, each column is formatted in a single
+    vectorized pass, and the markup only contains the elements Bulma needs to style the table.
+
+    Args:
+        dataframe: Pandas dataframe.
+        max_rows (optional, int): Maximum number of rows to show, or None for all rows.
+        max_cols (optional, int): Maximum number of columns to show, or None for all columns.
+        classes (optional, list): CSS classes of the table. Defaults to the Bulma striped table.
+
+    Returns:
+        string: Pandas dataframe in HTML format.
+    """
+
+    dataframe, row_break, col_break = _truncate(dataframe, max_rows, max_cols)
+    headers, columns = _format_table(dataframe, col_break)
+    rows = [list(row) for row in zip(*columns)] if columns else [[] for _ in range(len(dataframe))]
+
+    if row_break is not None:
+        rows.insert(row_break, ['...'] * len(headers))
+
+    return _table_html(headers, rows, classes)
+
+
+def render_table_pages(dataframe, page_rows, max_cols=10, classes=None):
+    """Returns the HTML tables of every row of a dataframe, split into pages of page_rows rows.
+
+    Columns are truncated and formatted once for the whole dataframe, then the formatted arrays are
+    sliced into pages without copying, so floats share the same decimal places on every page.
+    Each page's table repeats the header row.
+
+    Args:
+        dataframe: Pandas dataframe.
+        page_rows: Number of rows on each page.
+        max_cols (optional, int): Maximum number of columns to show, or None for all columns.
+        classes (optional, list): CSS classes of the tables. Defaults to the Bulma striped table.
+
+    Returns:
+        list: HTML of each page's table.
+    """
+
+    dataframe, row_break, col_break = _truncate(dataframe, None, max_cols)
+    headers, columns = _format_table(dataframe, col_break)
+    tables = []
+
+    for start in range(0, max(len(dataframe), 1), page_rows):
+        page = [column[start:start + page_rows] for column in columns]
+        rows = zip(*page) if page else [[] for _ in range(min(page_rows, len(dataframe) - start))]
+        tables.append(_table_html(headers, rows, classes))
+
+    return tables
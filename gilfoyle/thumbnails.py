@@ -0,0 +1,84 @@
+"""
+Page thumbnails
+
+Rasterizes the pages of a rendered PDF to PNG previews with PDFium, splitting the pages between worker
+processes. Requires the optional pypdfium2 and Pillow packages: pip install pypdfium2 pillow
+"""
+
+import io
+import math
+import os
+
+# Width of page thumbnails in pixels
+THUMBNAIL_WIDTH = 400
+
+# Documents with fewer pages per worker than this are rasterized in the calling process
+MIN_PAGES_PER_WORKER = 8
+
+
+def _import_pdfium():
+    try:
+        import pypdfium2
+        # Pillow encodes the rendered pages as PNG
+        import PIL
+    except ImportError:
+        raise ImportError('PNG thumbnails require pypdfium2 and Pillow: pip install pypdfium2 pillow') from None
+    return pypdfium2
+
+
+def _render_pages(pdf, start, stop, width):
+    """Rasterize a range of pages of a PDF to PNG bytes. Runs inside a worker process."""
+
+    pdfium = _import_pdfium()
+    document = pdfium.PdfDocument(pdf)
+    images = []
+
+    try:
+        for index in range(start, stop):
+            page = document[index]
+            # PDF units are points, so the scale is the number of pixels per point
+            bitmap = page.render(scale=width / page.get_width())
+            buffer = io.BytesIO()
+            bitmap.to_pil().save(buffer, format='PNG', optimize=False)
+            images.append(buffer.getvalue())
+            bitmap.close()
+            page.close()
+    finally:
+        document.close()
+
+    return images
+
+
+def render_thumbnails(pdf, width=THUMBNAIL_WIDTH, workers=None):
+    """Return a PNG thumbnail of every page of a PDF, rasterized in parallel worker processes.
+
+    PDFium is not thread-safe, so large documents are split into contiguous ranges of pages rendered
+    in separate processes. Short documents are rendered in the calling process, as starting workers
+    would take longer than rendering the pages.
+
+    Args:
+        pdf: PDF bytes.
+        width (optional, int): Thumbnail width in pixels. The height follows each page's aspect ratio.
+        workers (optional, int): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        list: PNG bytes of each page, in page order.
+    """
+
+    pdfium = _import_pdfium()
+    document = pdfium.PdfDocument(pdf)
+    pages = len(document)
+    document.close()
+
+    workers = min(workers or os.cpu_count() or 1, math.ceil(pages / MIN_PAGES_PER_WORKER))
+    if workers <= 1:
+        return _render_pages(pdf, 0, pages, width)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    size = math.ceil(pages / workers)
+    ranges = [(start, min(start + size, pages)) for start in range(0, pages, size)]
+
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [executor.submit(_render_pages, pdf, start, stop, width) for start, stop in ranges]
+        return [image for future in futures for image in future.result()]
@@ -26,5 +26,12 @@ setup(
         'Programming Language :: Python :: 3.8',
     ],
     install_requires=['pandas', 'weasyprint', 'jinja2', 'seaborn'],
+    extras_require={
+        'pdf': ['pypdf'],
+        'thumbnails': ['pypdfium2', 'Pillow'],
+        'images': ['Pillow'],
+        'parquet': ['pyarrow'],
+        'all': ['pypdf', 'pypdfium2', 'Pillow', 'pyarrow'],
+    },
     include_package_data=True
 )
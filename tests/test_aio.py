@@ -0,0 +1,128 @@
+"""
+Asyncio rendering tests
+
+Run with: python -m pytest tests
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from gilfoyle.aio import AsyncRenderer
+from gilfoyle.aio import RenderQueueFull
+from gilfoyle.report import Report
+
+
+class BlockingReport(Report):
+    """Report whose render waits until its gate is opened."""
+
+    gate = None
+
+    def create_report(self, payload, output='pdf', **kwargs):
+        self.gate.wait(10)
+        return super().create_report(payload, output=output, **kwargs)
+
+
+def make_job(output=None):
+    BlockingReport.gate = threading.Event()
+    pdf = BlockingReport(output=output)
+    payload = pdf.add_page(pdf.get_payload(), page_type='chapter', page_title='Report')
+    return pdf, payload
+
+
+async def wait_for_renders(renderer, active, queued):
+    while renderer.active != active or renderer.queued != queued:
+        await asyncio.sleep(0.01)
+
+
+def test_full_queue_raises():
+    async def main():
+        renderer = AsyncRenderer(max_concurrency=1, max_queue=1, executor='thread')
+        pdf, payload = make_job()
+
+        tasks = [asyncio.ensure_future(renderer.render(pdf, payload, output='html')) for _ in range(2)]
+        await wait_for_renders(renderer, 1, 1)
+
+        with pytest.raises(RenderQueueFull):
+            await renderer.render(pdf, payload, output='html')
+
+        pdf.gate.set()
+        results = await asyncio.gather(*tasks)
+        renderer.shutdown()
+        return renderer, results
+
+    renderer, results = asyncio.run(main())
+
+    assert all(result.startswith(b'<!DOCTYPE html>') for result in results)
+    assert renderer.active == 0 and renderer.queued == 0
+
+
+def test_cancelled_render_leaves_the_queue():
+    async def main():
+        renderer = AsyncRenderer(max_concurrency=1, max_queue=2, executor='thread')
+        pdf, payload = make_job()
+
+        running = asyncio.ensure_future(renderer.render(pdf, payload, output='html'))
+        waiting = asyncio.ensure_future(renderer.render(pdf, payload, output='html'))
+        await wait_for_renders(renderer, 1, 1)
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert renderer.queued == 0
+
+        pdf.gate.set()
+        await running
+        await renderer.render(pdf, payload, output='html')
+        renderer.shutdown()
+        return renderer
+
+    renderer = asyncio.run(main())
+
+    assert renderer.active == 0 and renderer.queued == 0
+
+
+def test_timed_out_render_gives_up_its_place():
+    async def main():
+        renderer = AsyncRenderer(max_concurrency=1, max_queue=2, executor='thread')
+        pdf, payload = make_job()
+
+        running = asyncio.ensure_future(renderer.render(pdf, payload, output='html'))
+        await wait_for_renders(renderer, 1, 0)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await renderer.render(pdf, payload, output='html', timeout=0.1)
+        # The running render cannot be interrupted, so it keeps its slot
+        assert renderer.active == 1 and renderer.queued == 0
+
+        pdf.gate.set()
+        await running
+        renderer.shutdown()
+        return renderer
+
+    renderer = asyncio.run(main())
+
+    assert renderer.active == 0 and renderer.queued == 0
+
+
+def test_render_writes_the_report_output(tmp_path):
+    path = str(tmp_path / 'report.html')
+
+    async def main():
+        renderer = AsyncRenderer(max_concurrency=1, executor='thread')
+        pdf, payload = make_job(path)
+        pdf.gate.set()
+        data = await pdf.create_report_async(payload, output='html', renderer=renderer)
+        renderer.shutdown()
+        return data
+
+    data = asyncio.run(main())
+
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_unsupported_executor():
+    with pytest.raises(ValueError, match='Unsupported executor'):
+        AsyncRenderer(executor='fibers')
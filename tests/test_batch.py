@@ -0,0 +1,75 @@
+"""
+Batch rendering tests
+
+Run with: python -m pytest tests
+"""
+
+import os
+
+from gilfoyle.batch import render_many
+from gilfoyle.report import Report
+
+
+class CrashingReport(Report):
+    """Report whose render kills the worker process."""
+
+    def create_report(self, payload, output='pdf', **kwargs):
+        os._exit(1)
+
+
+class FailingReport(Report):
+    """Report whose render raises."""
+
+    def create_report(self, payload, output='pdf', **kwargs):
+        raise ValueError('Broken report')
+
+
+def make_job(report_class=Report, output=None, title='Report'):
+    pdf = report_class(output=output)
+    pdf.set_title(title)
+    payload = pdf.add_page(pdf.get_payload(), page_type='chapter', page_title=title)
+    return pdf, payload
+
+
+def test_jobs_render_in_order():
+    jobs = [make_job(title='Report ' + str(i)) for i in range(4)]
+
+    results = render_many(jobs, workers=2, output='html')
+
+    for i, result in enumerate(results):
+        assert result['error'] is None
+        assert ('Report ' + str(i)).encode('utf-8') in result['data']
+
+
+def test_crashing_job_only_fails_itself():
+    jobs = [make_job(title='Report ' + str(i)) for i in range(13)]
+    jobs[4] = make_job(CrashingReport)
+
+    results = render_many(jobs, workers=2, output='html')
+
+    assert [i for i, result in enumerate(results) if result['error']] == [4]
+    assert 'terminated' in results[4]['error']
+    assert all(result['data'] for i, result in enumerate(results) if i != 4)
+
+
+def test_failing_job_reports_its_error():
+    jobs = [make_job(), make_job(FailingReport), make_job()]
+
+    results = render_many(jobs, workers=2, output='html')
+
+    assert results[0]['error'] is None and results[2]['error'] is None
+    assert 'ValueError: Broken report' in results[1]['error']
+
+
+def test_file_outputs_are_written_by_the_caller(tmp_path):
+    import io
+
+    target = io.BytesIO()
+    path = str(tmp_path / 'report.html')
+
+    results = render_many([make_job(output=target), make_job(output=path)], workers=2, output='html')
+
+    assert [result['error'] for result in results] == [None, None]
+    assert results[0]['data'] is None and target.getvalue().startswith(b'<!DOCTYPE html>')
+    with open(path, 'rb') as f:
+        assert f.read().startswith(b'<!DOCTYPE html>')
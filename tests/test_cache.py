@@ -0,0 +1,100 @@
+"""
+Render cache tests
+
+Run with: python -m pytest tests
+"""
+
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gilfoyle.cache import RenderCache
+from gilfoyle.report import Report
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RenderCache(str(tmp_path / 'renders'))
+
+
+def render(cache, output, title='Report', dataframe=None, visualisation=None):
+    pdf = Report(output=output, cache=cache, lazy_tables=True)
+    pdf.set_title(title)
+    payload = pdf.add_page(pdf.get_payload(), page_type='report', page_title='Page', page_layout='plot',
+                           page_dataframe=dataframe, page_visualisation=visualisation)
+    return pdf.create_report(payload, output='html')
+
+
+def test_unchanged_report_is_a_hit(cache, tmp_path):
+    path = str(tmp_path / 'report.html')
+
+    render(cache, path)
+    with open(path, 'rb') as f:
+        first = f.read()
+    render(cache, path)
+
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    with open(path, 'rb') as f:
+        assert f.read() == first
+
+
+def test_hits_are_written_to_file_objects(cache):
+    first = io.BytesIO()
+    second = io.BytesIO()
+
+    render(cache, first)
+    render(cache, second)
+
+    assert cache.hits == 1
+    assert second.getvalue() == first.getvalue()
+
+
+def test_changed_payload_is_a_miss(cache, tmp_path):
+    path = str(tmp_path / 'report.html')
+
+    render(cache, path, title='First')
+    render(cache, path, title='Second')
+
+    assert cache.stats()['hits'] == 0 and cache.stats()['entries'] == 2
+    with open(path, 'rb') as f:
+        assert b'Second' in f.read()
+
+
+def test_changed_table_is_a_miss(cache, tmp_path):
+    path = str(tmp_path / 'report.html')
+    dataframe = pd.DataFrame({'Sessions': np.arange(100)})
+
+    render(cache, path, dataframe=dataframe)
+    render(cache, path, dataframe=dataframe + 1)
+    render(cache, path, dataframe=dataframe)
+
+    assert cache.hits == 1 and cache.misses == 2
+
+
+def test_changed_image_file_is_a_miss(cache, tmp_path):
+    path = str(tmp_path / 'report.html')
+    image = tmp_path / 'chart.png'
+
+    image.write_bytes(b'\x89PNG\r\n\x1a\n' + b'first')
+    render(cache, path, visualisation=str(image))
+    image.write_bytes(b'\x89PNG\r\n\x1a\n' + b'second image')
+    render(cache, path, visualisation=str(image))
+
+    assert cache.hits == 0 and cache.misses == 2
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.max_size = 25
+    cache.put('first', b'a' * 10)
+    cache.put('second', b'b' * 10)
+    for age, key in enumerate(['first', 'second']):
+        os.utime(os.path.join(cache.directory, key), (1000 + age, 1000 + age))
+    assert cache.get('first', io.BytesIO())
+    cache.put('third', b'c' * 10)
+
+    assert cache.get('first', io.BytesIO()) and cache.get('third', io.BytesIO())
+    assert not cache.get('second', io.BytesIO())
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,81 @@
+"""
+Render daemon tests
+
+Run with: python -m pytest tests
+"""
+
+import socket
+import threading
+
+import pytest
+
+from gilfoyle import daemon
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / 'gilfoyle.sock')
+
+
+@pytest.fixture
+def server(socket_path):
+    server = daemon.RenderServer(socket_path, workers=1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def send(socket_path, message):
+    with daemon._connect(socket_path, 5) as sock:
+        daemon.send_message(sock, message)
+        return daemon.recv_message(sock)
+
+
+def test_ping(server, socket_path):
+    status = daemon.ping(socket_path)
+
+    assert status['ok'] and status['workers'] == 1 and status['rendered'] == 0
+
+
+@pytest.mark.parametrize('message', [['job'], 'ping', None])
+def test_invalid_requests_get_an_error(server, socket_path, message):
+    response = send(socket_path, message)
+
+    assert response['data'] is None
+    assert 'Invalid request of type ' + type(message).__name__ in response['error']
+    assert daemon.ping(socket_path)['ok']
+
+
+def test_stale_socket_is_replaced(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(socket_path)
+
+    server = daemon.RenderServer(socket_path, workers=1)
+    server.server_close()
+
+
+def test_socket_in_use_is_not_replaced(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(socket_path)
+        listener.listen()
+
+        with pytest.raises(OSError, match='Another process is listening'):
+            daemon.RenderServer(socket_path, workers=1)
+
+        # The other process can still be reached
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+
+
+def test_other_files_are_not_replaced(socket_path):
+    with open(socket_path, 'w') as f:
+        f.write('not a socket')
+
+    with pytest.raises(FileExistsError):
+        daemon.RenderServer(socket_path, workers=1)
+
+    with open(socket_path) as f:
+        assert f.read() == 'not a socket'
@@ -0,0 +1,89 @@
+"""
+Image input tests
+
+Run with: python -m pytest tests
+"""
+
+import pathlib
+
+import pytest
+
+from gilfoyle.images import InlineImage
+from gilfoyle.images import serialize_figure
+from gilfoyle.images import to_image
+from gilfoyle.report import Report
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(64))
+
+
+def add_visualisation(image, **kwargs):
+    pdf = Report(output=None, **kwargs)
+    payload = pdf.add_page(pdf.get_payload(), page_type='report', page_title='Chart', page_layout='plot',
+                           page_visualisation=image)
+    return payload['pages'][0]['page_visualisation']
+
+
+def test_paths_are_passed_through():
+    assert to_image('images/chart.png') == 'images/chart.png'
+    assert to_image(None) is None
+
+
+def test_path_objects_become_strings():
+    path = pathlib.Path('images') / 'chart.png'
+
+    assert to_image(path) == str(path)
+    assert add_visualisation(path) == str(path)
+
+
+@pytest.mark.parametrize('data', [PNG, bytearray(PNG), memoryview(PNG)])
+def test_bytes_are_wrapped(data):
+    image = to_image(data)
+
+    assert isinstance(image, InlineImage)
+    assert image.data == PNG and image.mime_type == 'image/png'
+
+
+def test_inline_images_are_passed_through():
+    image = InlineImage(PNG)
+
+    assert to_image(image) is image
+
+
+@pytest.mark.parametrize('figure_format, mime_type', [('png', 'image/png'), ('svg', 'image/svg+xml')])
+def test_figures_and_axes_are_serialized(figure_format, mime_type):
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    figure, axes = plt.subplots()
+    axes.plot([1, 2, 3])
+
+    try:
+        for image in (to_image(figure, figure_format), to_image(axes, figure_format)):
+            assert isinstance(image, InlineImage)
+            assert image.mime_type == mime_type and image.data
+    finally:
+        plt.close(figure)
+
+
+def test_figures_are_copied_when_added():
+    matplotlib = pytest.importorskip('matplotlib')
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    figure, axes = plt.subplots()
+    axes.plot([1, 2, 3])
+
+    try:
+        expected = serialize_figure(figure)
+        image = to_image(figure)
+        axes.set_title('Drawn after the figure was added')
+        assert image.data == expected
+        assert serialize_figure(figure) != expected
+    finally:
+        plt.close(figure)
+
+
+def test_unsupported_images_are_rejected():
+    with pytest.raises(TypeError, match='Unsupported image type int'):
+        to_image(12)
@@ -0,0 +1,107 @@
+"""
+Metric conversion tests
+
+Run with: python -m pytest tests
+"""
+
+import timeit
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gilfoyle.report import Report
+
+
+@pytest.mark.parametrize('string, expected', [
+    ('£1,200', 1200),
+    ('-£5', -5),
+    ('£-5', -5),
+    ('12.5%', 12.5),
+    ('£1,000.00', 1000.0),
+    ('1-2', 12),
+])
+def test_to_numeric(string, expected):
+    numeric = Report.to_numeric(string)
+
+    assert numeric == expected
+    assert type(numeric) is type(expected)
+
+
+def test_to_numeric_passes_numbers_through():
+    assert Report.to_numeric(12.5) == 12.5
+    assert Report.to_numeric(None) is None
+
+
+@pytest.mark.parametrize('dtype', [object, 'str', 'string'])
+def test_to_numeric_series_strings(dtype):
+    strings = ['£1,200', '-£5', '£-5', '--5', '-.5', '12.5%', '1-2', 'n/a']
+    numeric = Report.to_numeric_series(pd.Series(strings, dtype=dtype))
+
+    assert numeric.dtype == 'float64'
+    np.testing.assert_array_equal(numeric, [1200, -5, -5, -5, -0.5, 12.5, 12, np.nan])
+    assert [Report.to_numeric(string) for string in strings[:-1]] == numeric.tolist()[:-1]
+
+
+@pytest.mark.parametrize('dtype', [object, 'str'])
+def test_to_numeric_series_whole_numbers_are_ints(dtype):
+    assert Report.to_numeric_series(pd.Series(['£1,000', '-£3'], dtype=dtype)).dtype == 'int64'
+    assert Report.to_numeric_series(pd.Series(['1', '2.0'], dtype=dtype)).dtype == 'float64'
+
+
+def test_to_numeric_series_mixed_values():
+    numeric = Report.to_numeric_series(pd.Series(['£1,200', 5, None, 2.5], dtype=object))
+
+    np.testing.assert_array_equal(numeric, [1200, 5, np.nan, 2.5])
+
+
+def test_to_numeric_series_keeps_the_input_type():
+    dataframe = Report.to_numeric_series(pd.DataFrame({'Revenue': ['£1', '£2.5'], 'Sessions': ['1,000', '2']}))
+    array = Report.to_numeric_series(np.array(['1', '-2']))
+    numbers = pd.Series([1.5, 2.5])
+
+    assert dataframe.dtypes.tolist() == ['float64', 'int64']
+    assert isinstance(array, np.ndarray) and array.tolist() == [1, -2]
+    assert Report.to_numeric_series(numbers) is numbers
+
+
+def make_metrics(columns):
+    rng = np.random.default_rng(0)
+    metrics = {}
+    for i in range(columns):
+        values = rng.random(2) * 1e5
+        if i % 3 == 0:
+            metrics['Metric ' + str(i)] = ['£' + format(value, ',.2f') for value in values]
+        elif i % 3 == 1:
+            metrics['Metric ' + str(i)] = [format(int(value), ',') for value in values]
+        else:
+            metrics['Metric ' + str(i)] = [int(value) for value in values]
+    metrics.update({'Equal': [5, 5], 'Zero': [3, 0], 'Rate': [1.5, 3.0], 'Loss': ['-£5', '£10']})
+    return pd.DataFrame(metrics)
+
+
+def add_metric_tiles_one_by_one(pdf, dataframe, prefixes, suffixes):
+    return [pdf.add_metric_tile(column, dataframe[column].loc[0], dataframe[column].loc[1],
+                                metric_prefix=prefixes.get(column), metric_suffix=suffixes.get(column))
+            for column in dataframe.columns]
+
+
+def test_metric_tiles_match_metric_tile():
+    pdf = Report(output=None)
+    dataframe = make_metrics(30)
+    prefixes = {'Metric 2': '£'}
+    suffixes = {'Rate': '%'}
+
+    expected = add_metric_tiles_one_by_one(pdf, dataframe, prefixes, suffixes)
+
+    assert pdf.add_metric_tiles(dataframe, 0, 1, prefixes=prefixes, suffixes=suffixes) == expected
+
+
+def test_metric_tiles_are_faster_than_metric_tile():
+    pdf = Report(output=None)
+    dataframe = make_metrics(500)
+
+    tiles = min(timeit.repeat(lambda: pdf.add_metric_tiles(dataframe, 0, 1), number=3, repeat=3))
+    one_by_one = min(timeit.repeat(lambda: add_metric_tiles_one_by_one(pdf, dataframe, {}, {}), number=3, repeat=3))
+
+    assert tiles < one_by_one
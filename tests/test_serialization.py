@@ -0,0 +1,123 @@
+"""
+Payload serialization tests
+
+Run with: python -m pytest tests
+"""
+
+import base64
+import struct
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gilfoyle import serialization
+from gilfoyle.images import InlineImage
+from gilfoyle.report import Report
+from gilfoyle.tables import LazyTable
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 64
+
+
+def make_page(page_title, page_dataframe=None, page_visualisation=None):
+    return {'page_type': 'report',
+            'page_layout': 'simple',
+            'page_title': page_title,
+            'page_subheading': None,
+            'page_commentary': 'Commentary',
+            'page_message': {'title': 'Message', 'text': 'Text'},
+            'page_notification': None,
+            'page_metrics': [{'metric_title': 'Sessions', 'metric_value': 1200, 'metric_label': ''}],
+            'page_dataframe': page_dataframe,
+            'page_visualisation': page_visualisation,
+            'page_background': None}
+
+
+def make_dataframe(rows=1000):
+    return pd.DataFrame({'Sessions': np.arange(rows, dtype='int64'),
+                         'Revenue': np.linspace(0, 1000, rows),
+                         'Channel': ['Organic', 'Paid'] * (rows // 2)})
+
+
+def get_address_range(data):
+    start = np.frombuffer(data, dtype=np.uint8).ctypes.data
+    return start, start + len(data)
+
+
+def test_eager_payload_round_trip():
+    uri = 'data:image/png;base64,' + base64.b64encode(PNG).decode('ascii')
+    payload = {'report': {'title': 'Report', 'author': 'Author', 'date': '2021-01-01'},
+               'pages': [make_page('Cover'),
+                         make_page('Table', '<table><tr><td>1</td></tr></table>'),
+                         make_page('Chart', page_visualisation=uri),
+                         make_page('Path', page_visualisation='images/chart.png')]}
+
+    assert serialization.loads(serialization.dumps(payload)) == payload
+
+
+def test_lazy_payload_round_trip():
+    dataframe = make_dataframe()
+    table = LazyTable(dataframe, Report.format_dataframe)
+    payload = {'report': {'title': 'Report'}, 'pages': [make_page('Table', table)]}
+
+    data = serialization.dumps(payload)
+    loaded = serialization.loads(data)
+    loaded_table = loaded['pages'][0]['page_dataframe']
+
+    assert isinstance(loaded_table, LazyTable)
+    pd.testing.assert_frame_equal(loaded_table.dataframe, dataframe)
+
+    # Numeric columns are views of the message rather than copies, and are read-only
+    start, stop = get_address_range(data)
+    for column in ('Sessions', 'Revenue'):
+        values = loaded_table.dataframe[column].to_numpy()
+        assert start <= values.ctypes.data < stop
+        assert not values.flags.writeable
+
+
+def test_inline_images_are_stored_once():
+    image = InlineImage(PNG)
+    pages = [make_page('Chart ' + str(i), page_visualisation=image) for i in range(10)]
+
+    data = serialization.dumps({'report': {}, 'pages': pages})
+    loaded = serialization.loads(data)
+
+    assert len(data) < 2 * len(PNG)
+    for page in loaded['pages']:
+        assert isinstance(page['page_visualisation'], InlineImage)
+        assert page['page_visualisation'].data == PNG
+        assert page['page_visualisation'].mime_type == 'image/png'
+
+
+def test_data_uris_are_stored_once():
+    uri = 'data:image/png;base64,' + base64.b64encode(PNG).decode('ascii')
+    pages = [make_page('Chart ' + str(i), page_visualisation=uri) for i in range(10)]
+
+    data = serialization.dumps({'report': {}, 'pages': pages})
+    loaded = serialization.loads(data)
+
+    assert len(data) < 2 * len(PNG)
+    assert [page['page_visualisation'] for page in loaded['pages']] == [uri] * 10
+
+
+def test_unsupported_version():
+    data = bytearray(serialization.dumps({'report': {}, 'pages': []}))
+    struct.pack_into('>H', data, len(serialization.MAGIC), serialization.VERSION + 1)
+
+    with pytest.raises(ValueError, match='Unsupported payload version'):
+        serialization.loads(bytes(data))
+
+
+def test_bad_magic():
+    data = serialization.dumps({'report': {}, 'pages': []})
+
+    with pytest.raises(ValueError, match='Not a serialized Gilfoyle payload'):
+        serialization.loads(b'NOTGILFO' + data[len(serialization.MAGIC):])
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'payload.gil'
+    path.write_bytes(b'')
+
+    with pytest.raises(ValueError, match='Not a serialized Gilfoyle payload'):
+        serialization.load(str(path))
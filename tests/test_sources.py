@@ -0,0 +1,100 @@
+"""
+Data source tests
+
+Run with: python -m pytest tests
+"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gilfoyle import sources
+from gilfoyle.report import Report
+from gilfoyle.sources import DataSource
+
+
+@pytest.fixture
+def dataframe():
+    rng = np.random.default_rng(0)
+    dataframe = pd.DataFrame({'Column ' + str(i): rng.integers(0, 1000, 100) for i in range(14)})
+    dataframe['Region'] = rng.choice(['UK', 'US', 'DE'], 100)
+    return dataframe
+
+
+@pytest.fixture(params=['csv', 'parquet'])
+def path(request, tmp_path, dataframe):
+    path = str(tmp_path / ('sales.' + request.param))
+    if request.param == 'csv':
+        dataframe.to_csv(path, index=False)
+    else:
+        pytest.importorskip('pyarrow')
+        dataframe.to_parquet(path, row_group_size=30)
+    return path
+
+
+def add_table(pdf, dataframe):
+    payload = pdf.add_page(pdf.get_payload(), page_type='report', page_title='Sales', page_layout='simple',
+                           page_dataframe=dataframe)
+    return str(payload['pages'][0]['page_dataframe'])
+
+
+def test_columns_filters_and_limit_are_read(path, dataframe):
+    source = DataSource(path, columns=['Column 3', 'Column 0'], filters=[('Region', '==', 'UK')], limit=5)
+    expected = dataframe[dataframe['Region'] == 'UK'][['Column 3', 'Column 0']].head(5).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(source.read(), expected)
+
+
+def test_filtered_csv_stops_reading_at_the_limit(tmp_path, dataframe, monkeypatch):
+    path = str(tmp_path / 'sales.csv')
+    dataframe.to_csv(path, index=False)
+    chunks = []
+    _filter = DataSource._filter
+    monkeypatch.setattr(DataSource, '_filter', lambda self, chunk: chunks.append(len(chunk)) or _filter(self, chunk))
+    monkeypatch.setattr(sources, 'CHUNK_ROWS', 10)
+
+    assert len(DataSource(path, filters=[('Region', '!=', 'DE')], limit=3).read()) == 3
+    assert chunks == [10]
+
+def test_page_reads_only_the_rows_and_columns_it_shows(path, dataframe):
+    source = DataSource(path).for_page(13, 10)
+    read = source.read()
+
+    assert list(read.columns) == list(dataframe.columns[:6]) + list(dataframe.columns[-5:])
+    assert read['Column 0'].tolist() == dataframe['Column 0'].iloc[np.r_[0:8, 94:100]].tolist()
+
+
+@pytest.mark.parametrize('filters', [[], [('Region', '==', 'UK')]])
+def test_page_table_is_the_table_of_the_whole_file(path, dataframe, filters, monkeypatch):
+    monkeypatch.setattr(sources, 'CHUNK_ROWS', 10)
+    pdf = Report(output=None)
+    if filters:
+        dataframe = dataframe[dataframe['Region'] == 'UK'].reset_index(drop=True)
+
+    assert add_table(pdf, DataSource(path, filters=filters)) == add_table(pdf, dataframe)
+
+
+def test_identical_sources_are_read_once(path, monkeypatch):
+    calls = []
+    read = DataSource.read
+    read_column_names = DataSource._read_column_names
+    monkeypatch.setattr(DataSource, 'read', lambda self: calls.append('read') or read(self))
+    monkeypatch.setattr(DataSource, '_read_column_names',
+                        lambda self: calls.append('header') or read_column_names(self))
+    pdf = Report(output=None)
+
+    tables = [add_table(pdf, DataSource(path)) for _ in range(3)]
+
+    assert calls == ['header', 'read']
+    assert tables[1] == tables[0] and tables[2] == tables[0]
+    assert pdf.read_source(DataSource(path, limit=5)) is pdf.read_source(DataSource(path, limit=5))
+
+
+def test_copied_reports_do_not_keep_dataframes(path):
+    pdf = Report(output=None)
+    pdf.read_source(DataSource(path, limit=5))
+
+    assert len(pdf.sources) == 1
+    assert len(pickle.loads(pickle.dumps(pdf)).sources) == 0
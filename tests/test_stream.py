@@ -0,0 +1,30 @@
+"""
+Streaming report tests
+
+Run with: python -m pytest tests
+"""
+
+import numpy as np
+import pandas as pd
+
+from gilfoyle.profiling import Profiler
+from gilfoyle.report import Report
+
+
+def test_streamed_pages_are_profiled_in_order():
+    profiler = Profiler()
+    pdf = Report(output=None, profiler=profiler)
+    dataframe = pd.DataFrame({'Sessions': np.arange(25)})
+
+    with pdf.stream(output='html') as stream:
+        stream.add_page(page_type='report', page_title='First', page_layout='simple', page_dataframe=dataframe)
+        stream.add_page(page_type='report', page_title='Second', page_layout='simple', page_dataframe=dataframe,
+                        page_rows=10)
+        stream.add_page(page_type='report', page_title='Third', page_layout='simple')
+
+    pages = profiler.stats()['pages']
+    assert stream.page_count == 5
+    assert [page['page'] for page in pages] == [0, 1, 2, 3, 4]
+    assert [page['title'] for page in pages] == ['First', 'Second', 'Second', 'Second', 'Third']
+    assert [page['rows'] for page in pages] == [25, 10, 10, 5, 0]
+
@@ -0,0 +1,119 @@
+"""
+Table rendering tests
+
+Run with: python -m pytest tests
+"""
+
+import gc
+import re
+import weakref
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gilfoyle.report import Report
+from gilfoyle.tables import trim
+
+
+def add_table(dataframe, **kwargs):
+    page_rows = kwargs.pop('page_rows', None)
+    pdf = Report(output=None, **kwargs)
+    payload = pdf.add_page(pdf.get_payload(), page_type='report', page_title='Table', page_layout='simple',
+                           page_dataframe=dataframe, page_rows=page_rows)
+    return [page['page_dataframe'] for page in payload['pages']]
+
+
+def make_dataframe(rows, columns):
+    dataframe = pd.DataFrame(np.random.default_rng(0).random((rows, columns)),
+                             columns=['Column ' + str(i) for i in range(columns)])
+    dataframe.index = dataframe.index * 3
+    return dataframe
+
+
+@pytest.mark.parametrize('shape', [(5, 3), (13, 10), (14, 11), (15, 12), (200, 30)])
+def test_trim_keeps_truncation(shape):
+    dataframe = make_dataframe(*shape)
+    trimmed = trim(dataframe, 13, 10)
+
+    assert trimmed.shape[0] <= 14 and trimmed.shape[1] <= 11
+    assert trimmed.to_html(max_rows=13, max_cols=10) == dataframe.to_html(max_rows=13, max_cols=10)
+    assert not np.shares_memory(trimmed.to_numpy(), dataframe.to_numpy())
+
+
+@pytest.mark.parametrize('renderer', ['pandas', 'fast'])
+@pytest.mark.parametrize('shape', [(5, 3), (200, 30)])
+def test_lazy_tables_match_eager_tables(renderer, shape):
+    dataframe = make_dataframe(*shape)
+
+    eager = add_table(dataframe, table_renderer=renderer)
+    lazy = add_table(dataframe, table_renderer=renderer, lazy_tables=True)
+
+    assert [table.render() for table in lazy] == eager
+
+
+def test_lazy_table_pages_match_eager_table_pages():
+    dataframe = make_dataframe(95, 30)
+    dataframe['Column 0'] = np.round(dataframe['Column 0'], 1)
+    dataframe.loc[90, 'Column 0'] = 0.123
+
+    eager = add_table(dataframe, page_rows=20)
+    lazy = add_table(dataframe, page_rows=20, lazy_tables=True)
+
+    # Pages are formatted together, so every page shows the decimals the last page needs
+    assert len(lazy) == 5
+    assert [table.render() for table in reversed(lazy)] == eager[::-1]
+    assert re.fullmatch(r'[0-9]\.[0-9]00', get_cells(eager[0])[0])
+
+
+def test_lazy_tables_release_the_dataframe():
+    dataframe = make_dataframe(1000, 30)
+    reference = weakref.ref(dataframe)
+
+    tables = add_table(dataframe, lazy_tables=True)
+    del dataframe
+    gc.collect()
+
+    assert reference() is None
+    assert tables[0].dataframe.shape == (14, 11)
+
+
+def get_cells(html):
+    return re.findall(r'<td>(.*?)</td>', html, re.S)
+
+
+@pytest.mark.parametrize('values', [
+    [1.5, 2.25, np.nan, -3.0],
+    [1e-8, 1.5, 0.0, 2.0],
+    [1e20, 1.0, 2.0, 3.0],
+    [1234567.5, 1.25, 1.0, np.nan],
+    [0.1000006, np.inf, -np.inf, np.nan],
+    np.array([1.1, 2.2, 3.0, 4.0], dtype='float32'),
+    [1, 2, 3, -4],
+    [True, False, True, False],
+    pd.array([1, None, 3, 4], dtype='Int64'),
+    pd.array([True, None, False, True], dtype='boolean'),
+    pd.to_timedelta(['1D', '1D1s', None, '2h']),
+    pd.to_datetime(['2021-01-01', '2021-01-02', None, '2021-03-01']),
+    pd.to_datetime(['2021-01-01 10:00:00.500', '2021-01-02 00:00:00.000', None, '2021-03-01 00:00:00.000']),
+    pd.date_range('2021-01-01', periods=4, tz='UTC'),
+    pd.Categorical(['x', None, 'y', 'x']),
+    pd.Series(['  a ', '<b>', None, 'c&d']),
+    pd.Series(['a', None, 'c', 'x'], dtype='string'),
+    pd.Series(['a', 1.5, None, np.nan], dtype=object),
+])
+def test_fast_tables_match_to_html(values):
+    dataframe = pd.DataFrame({'Column': values})
+
+    assert get_cells(Report.format_dataframe(dataframe, 'fast')) == get_cells(dataframe.to_html(index=False))
+
+
+@pytest.mark.parametrize('scale', [1e-9, 1e-3, 1, 1e4, 1e7, 1e11])
+def test_fast_tables_match_to_html_floats(scale):
+    values = np.random.default_rng(0).standard_normal((100, 3)) * scale
+    values[::7, 0] = np.nan
+    dataframe = pd.DataFrame(np.round(values, 4), columns=['A', 'B', 'C'])
+
+    for max_rows in (13, None):
+        expected = get_cells(dataframe.to_html(max_rows=max_rows, max_cols=10, index=False))
+        assert get_cells(Report.format_dataframe(dataframe, 'fast', max_rows=max_rows)) == expected